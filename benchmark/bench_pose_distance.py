@@ -0,0 +1,46 @@
+"""Compare the numba kernels of BasePose.distanceMatrix with the NumPy version and the old pairwise loop.
+
+Usage:
+    python benchmark/bench_pose_distance.py [--people 12] [--frames 2000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from zdl.AI.pose_estimation.pose.body25 import BODY25
+
+
+def bench(title, func, frames):
+    func(*frames[0])  # compile or warm up
+    ts = time.time()
+    for poses1, poses2 in frames:
+        func(poses1, poses2)
+    te = time.time()
+    print(f'{title:>24}: {len(frames)} frames in {te - ts:.3f}s, {(te - ts) / len(frames) * 1e6:.1f} us/frame')
+    return te - ts
+
+
+def pairwise(algorithm):
+    def loop(poses1, poses2):
+        return [[BODY25.distance(p1, p2, algorithm) for p2 in poses2] for p1 in poses1]
+
+    return loop
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--people', type=int, default=12)
+    parser.add_argument('--frames', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    keypoints = rng.uniform(1, 1000, (args.frames + 1, args.people, *BODY25.SHAPE)).astype(np.float32)
+    keypoints[rng.uniform(size=keypoints.shape[:3]) < 0.3] = 0
+    frames = list(zip(keypoints[:-1], keypoints[1:]))
+    for algorithm in ('Manhattan', 'Euclidean'):
+        print(algorithm)
+        numpy_ = bench('numpy', lambda a, b: BODY25.distanceMatrixNumpy(a, b, algorithm), frames)
+        numba_ = bench('numba', lambda a, b: BODY25.distanceMatrix(a, b, algorithm), frames)
+        loop = bench('pairwise calls', pairwise(algorithm), frames[:max(len(frames) // 20, 1)]) * 20
+        print(f'speedup: {numpy_ / numba_:.2f}x vs numpy, {loop / numba_:.2f}x vs pairwise calls')
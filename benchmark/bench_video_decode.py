@@ -0,0 +1,36 @@
+"""Compare serial and process-parallel decoding of a whole video.
+
+Usage:
+    python benchmark/bench_video_decode.py VIDEO [--workers 8] [--chunk-size 256]
+"""
+import argparse
+import os
+import time
+
+from zdl.utils.media.frame_cache import LRUFrameCache
+from zdl.utils.media.video import Video
+
+
+def bench(title, frames):
+    ts = time.time()
+    count = sum(1 for _ in frames)
+    te = time.time()
+    print(f'{title:>24}: {count} frames in {te - ts:.2f}s, {count / (te - ts):.1f} fps')
+    return te - ts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('video')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=256)
+    args = parser.parse_args()
+
+    with Video(args.video, frame_cache=LRUFrameCache(0)) as video:
+        print(video.getInfo())
+        serial = bench('serial', video.readDict())
+        parallel = bench(f'parallel x{args.workers}',
+                         video.readParallel(workers=args.workers, chunk_size=args.chunk_size))
+        bench(f'parallel x{args.workers} unordered',
+              video.readParallel(workers=args.workers, chunk_size=args.chunk_size, ordered=False))
+    print(f'speedup: {serial / parallel:.2f}x')
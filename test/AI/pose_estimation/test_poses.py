@@ -0,0 +1,75 @@
+import numpy as np
+
+
+def _randomPoses(p, seed=0):
+    from zdl.AI.pose_estimation.pose.body25 import BODY25
+
+    rng = np.random.default_rng(seed)
+    keypoints = rng.uniform(1, 500, (p, *BODY25.SHAPE)).astype(np.float32)
+    keypoints[rng.uniform(size=keypoints.shape[:2]) < 0.3] = 0
+    return keypoints
+
+
+def test_poses_vectorized_matches_base_pose():
+    from zdl.AI.pose_estimation.pose.base_pose import Poses
+    from zdl.AI.pose_estimation.pose.body25 import BODY25
+
+    keypoints = _randomPoses(6)
+    keypoints[5, :, :] = 0
+    poses = Poses(keypoints, BODY25)
+    assert poses.key_points.shape == (6, 25, 4)
+    single = [BODY25(k) for k in keypoints]
+    assert np.allclose(poses.centers(np.ndarray), [p.center(list) for p in single])
+    assert np.allclose(poses.shoulderBreadth(), [p.shoulderBreadth() for p in single])
+    assert np.allclose(poses.torsoHeight(), [p.torsoHeight() for p in single])
+
+    assert np.shares_memory(poses[2].key_points, poses.key_points)
+    poses.cleanup(['arms'])
+    assert not poses[2].key_points[BODY25.PARTS_INDICES['arms']].any()
+
+    empty = Poses(np.array(0.0), BODY25)
+    assert len(empty) == 0 and empty.key_points.shape == (0, 25, 4)
+    assert empty.centers() == [] and empty.torsoHeight().shape == (0,)
+
+
+def _referenceDistance(pose1, pose2, algorithm):
+    if algorithm == 'Manhattan':
+        mask1, mask2 = (pose1[:, :2] != 0).any(axis=1), (pose2[:, :2] != 0).any(axis=1)
+    else:
+        mask1, mask2 = pose1[:, 2] > 0, pose2[:, 2] > 0
+    common = np.nonzero(mask1 & mask2)[0]
+    if len(common) == 0:
+        if algorithm == 'Manhattan':
+            c1, c2 = pose1[mask1, :2].mean(axis=0), pose2[mask2, :2].mean(axis=0)
+            return np.abs(c1 - c2).sum() / 2
+        from zdl.AI.pose_estimation.pose.body25 import BODY25
+        return BODY25(pose1).center().disTo(BODY25(pose2).center())
+    dis = np.abs(pose1[common, :2] - pose2[common, :2])
+    per_point = dis.max(axis=1) if algorithm == 'Manhattan' else np.sqrt((dis ** 2).sum(axis=1))
+    if len(common) > 1:
+        keep = np.arange(len(common)) != np.argmax(per_point)
+        dis, per_point = dis[keep], per_point[keep]
+    return dis.mean() if algorithm == 'Manhattan' else per_point.mean()
+
+
+def test_distance_matrix():
+    from zdl.AI.pose_estimation.pose.base_pose import Poses
+    from zdl.AI.pose_estimation.pose.body25 import BODY25
+
+    poses1, poses2 = _randomPoses(4, 1), _randomPoses(3, 2)
+    # no common point, only one common point
+    poses1[0, 12:] = 0
+    poses2[0, :12] = 0
+    poses1[1, 1:] = 0
+    poses1[1, 0] = (100, 120, 0.8)
+    poses2[1, 0] = poses1[1, 0] + 3
+    for algorithm in ('Manhattan', 'Euclidean'):
+        matrix = Poses(poses1, BODY25).distanceMatrix(Poses(poses2, BODY25), algorithm)
+        assert matrix.shape == (4, 3)
+        for i in range(4):
+            for j in range(3):
+                expected = _referenceDistance(poses1[i], poses2[j], algorithm)
+                assert np.isclose(matrix[i, j], expected, rtol=1e-4)
+                assert np.isclose(BODY25.distance(poses1[i], poses2[j], algorithm), matrix[i, j])
+        assert np.allclose(BODY25.distanceMatrixNumpy(poses1, poses2, algorithm), matrix)
+    assert BODY25.distanceMatrix(np.zeros((0, 25, 3)), poses2).shape == (0, 3)
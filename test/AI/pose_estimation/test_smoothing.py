@@ -0,0 +1,30 @@
+import numpy as np
+
+
+def test_smoothers_reduce_jitter_and_respect_missing_points():
+    from zdl.AI.pose_estimation.pose.body25 import BODY25
+    from zdl.AI.pose_estimation.smoothing import EMASmoother, KalmanSmoother, OneEuroSmoother
+
+    rng = np.random.default_rng(0)
+    t, p = 60, 2
+    truth = np.zeros((t, p, 25, 4))
+    truth[..., 0] = np.linspace(100, 160, t)[:, None, None] + np.arange(25) * 10
+    truth[..., 1] = 300
+    truth[..., 2] = 0.8
+    noisy = truth.copy()
+    noisy[..., :2] += rng.normal(0, 3, noisy[..., :2].shape)
+    noisy[20:22, 0, 5] = 0
+    for smoother in (EMASmoother(BODY25), OneEuroSmoother(BODY25), KalmanSmoother(BODY25)):
+        smoothed = smoother.smooth(noisy)
+        assert smoothed.shape == noisy.shape
+        assert not smoothed[20:22, 0, 5].any()
+        assert (smoothed[22, 0, 5, :2] == noisy[22, 0, 5, :2]).all()  # restarted from the observation
+        assert (smoothed[..., 2] == noisy[..., 2]).all()
+        err = lambda a: np.abs(a[30:, ..., :2] - truth[30:, ..., :2]).mean()
+        assert err(smoothed) < err(noisy)
+
+    smoother = OneEuroSmoother(BODY25, inherit_max=1)
+    out = [smoother.update(frame, ids=[7, 3]) for frame in noisy[18:23]]
+    assert (out[2][0, 5, :3] == out[1][0, 5, :3]).all() and out[2][0, 5, 3] == 1
+    assert not out[3][0, 5].any()
+    assert len(smoother.drop([7])) == 1
@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def test_pose_tracker_keeps_ids():
+    from zdl.AI.pose_estimation.pose.body25 import BODY25
+    from zdl.AI.pose_estimation.tracker import PoseTracker
+
+    rng = np.random.default_rng(0)
+    people = rng.uniform(100, 900, (3, 25, 3)).astype(np.float32)
+    people[..., 2] = 0.8
+    for solver in ('hungarian', 'greedy'):
+        tracker = PoseTracker(BODY25, max_distance=30, max_age=2, solver=solver)
+        first = tracker.update(people)
+        assert list(first) == [0, 1, 2]
+        for t in range(1, 4):
+            moved = people + t * 2
+            moved[..., 2] = 0.8
+            order = rng.permutation(3)
+            assert list(tracker.update(moved[order])) == list(first[order])
+        # person 2 leaves for longer than max_age, comes back with a new id
+        ended = []
+        for _ in range(3):
+            assert list(tracker.update(moved[:2])) == [0, 1]
+            ended.append(list(tracker.ended))
+        assert ended == [[], [], [2]]
+        assert list(tracker.update(moved)) == [0, 1, 3]
+        assert len(tracker.ended) == 0
+        assert len(tracker.update(np.array(0.0))) == 0 and len(tracker) == 3
+
+
+def test_smoother_frees_ended_tracks():
+    from zdl.AI.pose_estimation.pose.body25 import BODY25
+    from zdl.AI.pose_estimation.smoothing import EMASmoother
+    from zdl.AI.pose_estimation.tracker import PoseTracker
+
+    base = np.random.default_rng(1).uniform(100, 200, (1, 25, 3)).astype(np.float32)
+    tracker, smoother = PoseTracker(BODY25, max_distance=30, max_age=1), EMASmoother(BODY25)
+    for t in range(40):
+        # a new person every 4 frames, far from the previous one
+        people = base + (t // 4) * 1000
+        ids = tracker.update(people)
+        smoother.update(people, ids)
+        smoother.drop(tracker.ended)
+    assert tracker._next_id == 10
+    assert len(smoother) <= 2 and len(smoother._missing) == 8
@@ -0,0 +1,28 @@
+import pytest
+
+
+@pytest.fixture(scope='session')
+def video_file(tmp_path_factory):
+    """A tiny MJPG video whose frame i is filled with value i * 4."""
+    import cv2
+    import numpy as np
+
+    fname = str(tmp_path_factory.mktemp('media') / 'frames.avi')
+    writer = cv2.VideoWriter(fname, cv2.VideoWriter_fourcc(*'MJPG'), 25, (64, 48))
+    for i in range(50):
+        writer.write(np.full((48, 64, 3), i * 4, dtype=np.uint8))
+    writer.release()
+    return fname
+
+
+@pytest.fixture(autouse=True, scope='session')
+def video_info_cache_dir(tmp_path_factory):
+    """Keep the shared video info cache out of the home directory."""
+    import os
+    from unittest import mock
+    from zdl.utils.media.video import VideoInfoCache
+
+    with mock.patch.dict(os.environ, {'ZDL_CACHE_DIR': str(tmp_path_factory.mktemp('zdl_cache'))}):
+        VideoInfoCache._shared = None
+        yield
+        VideoInfoCache._shared = None
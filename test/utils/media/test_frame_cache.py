@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def _frame(v):
+    return np.full((10, 10, 3), v, dtype=np.uint8)
+
+
+def test_lru_evicts_by_bytes():
+    from zdl.utils.media.frame_cache import LRUFrameCache
+
+    cache = LRUFrameCache(max_bytes=3 * 300)
+    for i in range(3):
+        cache.put(i, _frame(i))
+    assert cache.get(0)[0, 0, 0] == 0
+    cache.put(3, _frame(3))
+    assert 1 not in cache and 0 in cache
+    assert cache.get(1) is None
+    assert cache.stats() == {'frames': 3, 'nbytes': 900, 'max_bytes': 900, 'hits': 1, 'misses': 1,
+                             'evictions': 1}
+
+
+def test_lfu_and_compressed_storage():
+    from zdl.utils.media.frame_cache import LFUFrameCache
+
+    cache = LFUFrameCache(max_bytes=2 * 75, scale=0.5)
+    cache.put(0, _frame(10)).put(1, _frame(20))
+    cache.get(0)
+    cache.put(2, _frame(30))
+    assert 0 in cache and 1 not in cache
+    assert cache.get(2).shape == (10, 10, 3)
+
+
+def test_fetched_frames_are_copies():
+    from zdl.utils.media.frame_cache import LRUFrameCache
+
+    cache = LRUFrameCache()
+    cache.put(0, _frame(7))
+    cache.get(0)[:] = 0
+    assert cache.get(0).mean() == 7
@@ -0,0 +1,22 @@
+import multiprocessing as mp
+
+
+def _consume(ring, results):
+    results.put([(i, int(frame.mean())) for i, frame in ring.frames()])
+
+
+def test_feed_ring_across_processes(video_file):
+    from zdl.utils.media.video import Video
+
+    with Video(video_file) as video, video.sharedRing(slots=3, size=(16, 12), gray=True) as ring:
+        assert ring.shape == (12, 16)
+        results = mp.Queue()
+        workers = [mp.Process(target=_consume, args=(ring, results)) for _ in range(2)]
+        for w in workers:
+            w.start()
+        video.feedRing(ring, range(0, 50, 5), consumers=2, size=(16, 12), gray=True)
+        got = sorted(results.get(timeout=30) + results.get(timeout=30))
+        for w in workers:
+            w.join()
+    assert [i for i, _ in got] == list(range(0, 50, 5))
+    assert all(abs(v - i * 4) <= 2 for i, v in got)
@@ -0,0 +1,148 @@
+import numpy as np
+
+
+def _images(n=5, shape=(12, 16, 3)):
+    return np.random.default_rng(0).integers(0, 256, (n, *shape), dtype=np.uint8)
+
+
+def test_image_stack_matches_image_cv():
+    from zdl.utils.media.image import ImageCV, ImageStack
+    from zdl.utils.media.rect import Rect
+
+    images = _images()
+    stack = ImageStack(images, chunk=2)
+    singles = [ImageCV(img) for img in images]
+    assert np.array_equal(stack.gray().org(), [s.gray().org() for s in singles])
+    assert np.allclose(stack.brightness(), [s.brightness() for s in singles])
+    assert np.array_equal(stack.hist([32]), [s.hist(False, [32]) for s in singles])
+    assert np.array_equal(stack.diff(images[0]).org(), [s.diff(images[0]).org() for s in singles])
+    rect = Rect(xyxy=(2, 3, 10, 9))
+    assert np.array_equal(stack.roiCopy(rect)[1].org(), singles[1].roiCopy(rect).org())
+    expected = [ImageCV(img).enhanceBrightnessTo(100).org() for img in images]
+    before = images.copy()
+    assert np.array_equal(stack.enhanceBrightnessTo(100).org(), expected)
+    assert np.array_equal(images, before)
+    # read-only (e.g. memory mapped) and non-contiguous stacks
+    images.flags.writeable = False
+    assert np.array_equal(ImageStack(images).enhanceBrightnessTo(100).org(), expected)
+    strided = ImageStack(np.ascontiguousarray(images[:, ::-1])[:, ::-1], chunk=3).enhanceBrightnessTo(100)
+    assert np.array_equal(strided.org(), expected)
+
+
+def test_image_stack_from_video(video_file):
+    from zdl.utils.media.image import ImageStack
+    from zdl.utils.media.video import Video
+
+    with Video(video_file) as video:
+        stack = ImageStack.fromVideo(video, range(40), stride=8, gray=True)
+        assert list(stack.indices) == [0, 8, 16, 24, 32]
+        assert np.allclose(stack.brightness(), stack.indices * 4, atol=2)
+        assert len(ImageStack.fromFrames(video.readDict([1, 2]))) == 2
+
+
+def test_derived_views_cached_and_invalidated():
+    from zdl.utils.media.image import ImageCV
+
+    img = ImageCV(_images(1)[0])
+    assert img.gray() is img.gray()
+    hist = img.hist(False)
+    hist[:] = 0
+    assert img.hist(False).sum() == 12 * 16 * 4
+    gray, brightness = img.gray(), img.brightness()
+    img.apply(lambda a: a // 2)
+    assert img.gray() is not gray and img.brightness() < brightness
+    assert img.getInfo()['shape'] == (12, 16, 3)
+    img.setCacheBytes(0)
+    gray = img.gray()
+    assert img.gray() is not gray
+    img.setCacheBytes(12 * 16 * 2)
+    img.B(), img.G(), img.R()
+    assert list(img._derived) == ['G', 'R']
+
+
+def test_image_cv_header_probe_and_reduced_decode(tmp_path):
+    import cv2
+    from zdl.utils.media.image import ImageCV
+
+    for suffix in ['.jpg', '.png']:
+        path = str(tmp_path / f'img{suffix}')
+        cv2.imwrite(path, _images(1, (101, 157, 3))[0])
+        for reduce, gray in [(1, False), (2, False), (4, True), (8, False)]:
+            img = ImageCV(path, reduce=reduce, gray=gray)
+            info = img.getInfo()
+            assert img._img is None
+            assert info['shape'][:2] == img.org().shape[:2]
+            assert info['channels'] == (1 if gray else 3) == img._shape()[2]
+
+
+def test_image_folder(tmp_path):
+    import cv2
+    from zdl.utils.media.dataset import ImageFolder
+
+    for i in range(7):
+        cv2.imwrite(str(tmp_path / f'{i}.png'), np.full((10 + i, 8, 3), i * 10, dtype=np.uint8))
+    (tmp_path / 'note.txt').write_text('not an image')
+    folder = ImageFolder(str(tmp_path), workers=3, prefetch=3)
+    assert len(folder) == 7
+    assert [int(img.brightness()) for img in folder] == [i * 10 for i in range(7)]
+    unordered = ImageFolder(str(tmp_path / '*.png'), ordered=False, gray=True)
+    assert sorted(int(img.brightness()) for img in unordered) == [i * 10 for i in range(7)]
+    stacks = list(ImageFolder(str(tmp_path), size=(4, 5)).batches(3))
+    assert [s.org().shape for s in stacks] == [(3, 5, 4, 3), (3, 5, 4, 3), (1, 5, 4, 3)]
+    assert stacks[-1].indices[0].endswith('6.png')
+
+
+def test_draw_bboxes_deterministic():
+    from zdl.utils.media.draw import BboxRenderer
+    from zdl.utils.media.image import ImageCV
+    from zdl.utils.media.rect import Rect
+
+    frame = np.zeros((60, 80, 3), dtype=np.uint8)
+    entities = [(Rect(xywh=(10, 30, 20, 20)), 'cat'), (Rect(xywh=(70, 2, 30, 30)), 'dog 0.9', 'dog')]
+    first = ImageCV(frame).drawBboxes(entities).org()
+    assert np.array_equal(first, ImageCV(frame).drawBboxes(entities).org())
+    assert not frame.any()
+    renderer = BboxRenderer()
+    assert tuple(first[40, 10 - 1]) == renderer.colorOf('cat')
+    out = np.empty((2, 60, 80, 3), dtype=np.uint8)
+    drawn = renderer.drawBatch([frame, frame], [entities, []], out=out)
+    assert np.shares_memory(drawn[0], out)
+    assert np.array_equal(out[0], first) and not out[1].any()
+    assert len(renderer._sprites) == 2
+
+
+def test_pil_cv_conversion_and_brightness_lut():
+    import PIL.Image
+    import PIL.ImageEnhance
+    from zdl.utils.media.image import ImageCV, ImagePIL
+
+    rng = np.random.default_rng(0)
+    bgr = rng.integers(0, 256, (20, 30, 3), dtype=np.uint8)
+    pil = ImageCV(bgr).toPIL()
+    assert (np.asarray(pil.org()) == bgr[..., ::-1]).all()
+    assert (pil.toCV().org() == bgr).all()
+    assert pil.toCV().org().flags.writeable
+    bgra = rng.integers(0, 256, (20, 30, 4), dtype=np.uint8)
+    assert (ImageCV(bgra).toPIL().toCV().org() == bgra).all()
+    assert (np.asarray(ImageCV(bgr[:, ::2]).toPIL().org()) == bgr[:, ::2, ::-1]).all()
+    gray = rng.integers(0, 256, (20, 30), dtype=np.uint8)
+    assert (np.asarray(ImageCV(gray).toPIL().org()) == gray).all()
+    assert abs(pil.brightness() - np.asarray(pil.org().convert('L')).mean()) < 0.5
+
+    expected = np.asarray(PIL.ImageEnhance.Brightness(pil.org()).enhance(80 / ImageCV(bgr).brightness() + 0.1))
+    assert (ImageCV(bgr.copy()).enhanceBrightnessTo(80).org() == expected[..., ::-1]).all()
+    factor = 80 / pil.brightness() + 0.1
+    expected = np.asarray(PIL.ImageEnhance.Brightness(pil.org()).enhance(factor))
+    assert (np.asarray(ImagePIL(pil.org()).enhanceBrightnessTo(80).org()) == expected).all()
+
+
+def test_brightness_lut_matches_pil():
+    import PIL.Image
+    import PIL.ImageEnhance
+    from zdl.utils.media.image import _brightnessLut
+
+    levels = np.arange(256, dtype=np.uint8).reshape(16, 16)
+    factors = [1.3, 2.55, 0.37] + np.random.default_rng(0).uniform(0.05, 4, 200).tolist()
+    for factor in factors:
+        expected = np.asarray(PIL.ImageEnhance.Brightness(PIL.Image.fromarray(levels)).enhance(factor)).ravel()
+        assert (_brightnessLut(factor) == expected).all(), factor
@@ -0,0 +1,60 @@
+import numpy as np
+
+
+def test_hashes_near_duplicates():
+    from zdl.utils.media.image import ImageCV, ImageStack
+    from zdl.utils.media.phash import aHash, dHash, pHash, hamming
+
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    noisy = np.clip(base.astype(int) + rng.integers(-8, 9, base.shape), 0, 255).astype(np.uint8)
+    other = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    stack = ImageStack(np.stack([base, noisy, other]))
+    for method in (aHash, dHash, pHash):
+        hashes = method(stack)
+        assert hashes.dtype == np.uint64 and hashes.shape == (3,)
+        assert hamming(hashes[0], hashes[1]) < hamming(hashes[0], hashes[2])
+        assert method(ImageCV(base))[0] == method([base])[0] == hashes[0]
+        # a 3 dims array is a gray batch even when W is 3
+        assert method(stack.gray().org()[:, :, :3]).shape == (3,)
+
+
+def test_hamming_index_matches_brute_force():
+    from zdl.utils.media.phash import HammingIndex, hamming
+
+    rng = np.random.default_rng(1)
+    hashes = rng.integers(0, 2 ** 63, 300, dtype=np.uint64)
+    flips = np.uint64(1) << rng.integers(0, 64, (300, 5)).astype(np.uint64)
+    near = hashes ^ np.bitwise_or.reduce(flips, axis=1)
+    index = HammingIndex().add(np.concatenate([hashes, near]))
+    for radius in (0, 5, 9):
+        for n in (0, 17, 400):
+            q = index._hashes[n]
+            ids, distances = index.query(q, radius)
+            brute = np.nonzero(hamming(index._hashes, q) <= radius)[0]
+            assert sorted(ids) == sorted(brute)
+            assert list(distances) == sorted(distances)
+    distances = hamming(index._hashes[:, None], index._hashes[None, :])
+    for radius in (0, 5, 9):
+        assert np.array_equal(index.pairs(radius), np.argwhere(np.triu(distances <= radius, 1)))
+    labels = index.cluster(radius=5)
+    assert (labels[:300] == labels[300:]).all()
+    assert len(set(labels)) == 300
+
+
+def test_hamming_index_online_adds():
+    from zdl.utils.media.phash import HammingIndex, hamming
+
+    rng = np.random.default_rng(2)
+    hashes = rng.integers(0, 2 ** 63, 3000, dtype=np.uint64)
+    hashes[1::3] = hashes[::3][:1000] ^ np.uint64(0b1011)
+    index = HammingIndex()
+    for n, h in enumerate(hashes):
+        if n % 97 == 0 and n:
+            ids, _ = index.query(h, 4)
+            assert sorted(ids) == list(np.nonzero(hamming(hashes[:n], h) <= 4)[0])
+        index.add(h, ids=[n])
+    # merged a few times, never re-sorted per add
+    assert 0 < index._indexed <= len(index) == 3000
+    assert all(len(keys) == index._indexed for keys, _ in index._tables)
+    assert all((np.diff(keys.astype(np.int64)) >= 0).all() for keys, _ in index._tables)
@@ -0,0 +1,34 @@
+import numpy as np
+
+
+def test_roi_cropper_maps_points_back():
+    from zdl.utils.media.rect import Rect
+    from zdl.utils.media.roi import RoiCropper, mapBack
+
+    img = np.zeros((200, 300, 3), dtype=np.uint8)
+    img[50:150, 100:140] = 255
+    rects = [Rect(xyxy=(100, 50, 140, 150)), Rect(xywh=(0, 0, 300, 200)), Rect(xyxy=(280, 190, 280, 190))]
+    for letterbox in (False, True):
+        cropper = RoiCropper((64, 64), letterbox=letterbox)
+        batch, transforms = cropper.crop(img, rects)
+        assert batch.shape == (3, 64, 64, 3) and transforms.shape == (3, 4)
+        assert np.shares_memory(batch, cropper.crop(img, rects[:1])[0])
+        if letterbox:
+            assert batch[0, :, :16].max() == 0 and batch[0, :, 26:40].min() == 255
+        else:
+            assert batch[0].min() == 255
+        points = np.array([[[32, 32, 0.9], [0, 0, 0]]] * 3, dtype=float)
+        mapped = mapBack(points, transforms)
+        assert np.allclose(mapped[0, 0], [120, 100, 0.9])
+        assert np.allclose(mapped[1, 0, :2], [150, 100], atol=3)
+        assert (mapped[:, 1] == 0).all()
+
+
+def test_roi_cropper_batches_across_frames():
+    from zdl.utils.media.roi import RoiCropper
+
+    img = np.arange(100 * 100, dtype=np.uint16).reshape(100, 100) % 256
+    rects = np.array([[0, 0, 50, 50], [10, 10, 90, 90], [50, 50, 100, 100]], dtype=float)
+    got = [(len(batch), owners) for batch, _, owners in
+           RoiCropper((32, 16)).batches([(img, rects), (img, rects[:1])], batch_size=3)]
+    assert got == [(3, [(0, 0), (0, 1), (0, 2)]), (1, [(1, 0)])]
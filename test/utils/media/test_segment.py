@@ -0,0 +1,15 @@
+import numpy as np
+
+
+def test_segmenter_matches_distance_hist():
+    from zdl.utils.media.image import ImageCV
+    from zdl.utils.media.segment import HistSegmenter
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 80, (24, 32, 3), dtype=np.uint8) for _ in range(3)] + \
+             [rng.integers(150, 256, (24, 32, 3), dtype=np.uint8) for _ in range(4)]
+    sections, distances = HistSegmenter(threshold=0.1, batch_size=4).segment(enumerate(frames))
+    expected = [ImageCV(frames[i]).distanceHist(ImageCV(frames[i + 1]), show=False)[-1] for i in range(6)]
+    assert np.allclose(distances[:, 2], expected)
+    assert distances[:, :2].tolist() == [[i, i + 1] for i in range(6)]
+    assert sections.tolist() == [[0, 2], [3, 6]]
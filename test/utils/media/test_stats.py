@@ -0,0 +1,35 @@
+import numpy as np
+
+
+def test_stream_stats_over_video(video_file):
+    from zdl.utils.media.image import ImageCV
+    from zdl.utils.media.stats import StreamStats
+    from zdl.utils.media.video import Video
+
+    stats = StreamStats(window=10, hist_size=64)
+    brightness, hists = [], []
+    with Video(video_file) as video:
+        for index, frame, stats in stats.stage(video.readDict()):
+            img = ImageCV(frame)
+            brightness.append(img.brightness())
+            hists.append(img.hist(show=False, hist_size=[64]))
+            window = brightness[-10:]
+            assert np.isclose(stats.brightness.mean, np.mean(window))
+            assert np.isclose(stats.brightness.std, np.std(window), atol=1e-4)
+            assert np.allclose(stats.hists.hist(), np.sum(hists[-10:], axis=0))
+    assert index == 49 and len(stats.brightness) == 10
+
+
+def test_stream_stats_channel_layouts():
+    import cv2
+    from zdl.utils.media.stats import StreamStats
+
+    bgr = np.random.default_rng(0).integers(0, 256, (12, 16, 3), dtype=np.uint8)
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    expected = StreamStats().update(bgr)
+    bgra = StreamStats().update(cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA))
+    assert bgra.brightness.mean == expected.brightness.mean
+    assert np.array_equal(bgra.hists.hist(), expected.hists.hist())
+    single = StreamStats().update(gray[..., np.newaxis])
+    assert single.brightness.mean == StreamStats().update(gray).brightness.mean == expected.brightness.mean
+    assert single.hists.hist().shape == (1, 256)
@@ -0,0 +1,30 @@
+import numpy as np
+
+
+def test_tiled_matches_whole_image(tmp_path):
+    import cv2
+    from zdl.utils.media.image import ImageCV
+    from zdl.utils.media.tiled import TiledImage
+
+    rng = np.random.default_rng(0)
+    arr = rng.integers(0, 256, (101, 37, 3), dtype=np.uint8)
+    np.save(tmp_path / 'img.npy', arr)
+    img = ImageCV(arr.copy())
+    tiled = TiledImage(str(tmp_path / 'img.npy'), tile_rows=16)
+    assert isinstance(tiled.source, np.memmap)
+    assert (tiled.gray() == img.gray().org()).all()
+    assert (tiled.HSV(out=str(tmp_path / 'hsv.npy')) == img.HSV().org()).all()
+    assert (np.load(tmp_path / 'hsv.npy') == img.HSV().org()).all()
+    other = rng.integers(0, 256, arr.shape, dtype=np.uint8)
+    assert (tiled.diff(other) == cv2.absdiff(arr, other)).all()
+    # non-contiguous outputs get every band too
+    out = np.zeros((arr.shape[0], arr.shape[1] * 2, 3), dtype=np.uint8)[:, ::2]
+    assert (tiled.diff(other, out=out) == cv2.absdiff(arr, other)).all()
+    assert (tiled.HSV(out=out) == img.HSV().org()).all()
+    assert (tiled.gray(out=out[..., 0]) == img.gray().org()).all()
+    assert np.allclose(tiled.hist(32), img.hist(show=False, hist_size=[32]))
+    assert np.isclose(tiled.brightness(), img.brightness())
+    stats = tiled.stats()
+    assert np.allclose(stats['mean'], arr.reshape(-1, 3).mean(axis=0))
+    assert np.allclose(stats['std'], arr.reshape(-1, 3).std(axis=0))
+    assert np.isclose(img.tiled(tile_rows=7).brightness(), img.brightness())
@@ -0,0 +1,150 @@
+def _value(frame):
+    return round(float(frame.mean()) / 4)
+
+
+def test_read_frame_with_cursor(video_file):
+    from zdl.utils.media.video import Video
+
+    with Video(video_file, seek_window=10) as video:
+        for i in [0, 1, 5, 30, 12, 49, 3]:
+            assert _value(video.readFrame(i, need_type=None)) == i
+    assert video._cap is None
+
+
+def test_read_dict(video_file):
+    from zdl.utils.media.video import Video
+
+    with Video(video_file) as video:
+        assert [(i, _value(f)) for i, f in video.readDict([40, 2, 7])] == [(2, 2), (7, 7), (40, 40)]
+
+
+def test_read_dict_prefetch_stops_early(video_file):
+    import threading
+    from zdl.utils.media.video import Video
+
+    with Video(video_file) as video:
+        frames = video.readDict(range(0, 50, 3), prefetch=4)
+        assert [next(frames)[0] for _ in range(3)] == [0, 3, 6]
+        got = [(i, _value(f)) for i, f in frames]
+        assert got == [(i, i) for i in range(9, 50, 3)]
+        frames = video.readDict(prefetch=2)
+        next(frames)
+        frames.close()
+    assert not any(t.name.startswith('Thread') and t.daemon and t.is_alive() for t in threading.enumerate()
+                   if t is not threading.main_thread())
+
+
+def test_read_dict_cache_hits_not_reput(video_file):
+    from zdl.utils.media.frame_cache import LFUFrameCache
+    from zdl.utils.media.video import Video
+
+    with Video(video_file, frame_cache=LFUFrameCache()) as video:
+        for _ in range(3):
+            list(video.readDict(range(2), cache=True))
+        assert video.frame_cache._counts == {0: 3, 1: 3}
+
+
+def test_read_parallel(video_file):
+    from zdl.utils.media.video import Video
+
+    with Video(video_file) as video:
+        ordered = [(i, _value(f)) for i, f in video.readParallel(range(3, 50, 2), workers=2, chunk_size=5)]
+        assert ordered == [(i, i) for i in range(3, 50, 2)]
+        unordered = video.readParallel(workers=3, chunk_size=7, ordered=False)
+        assert sorted((i, _value(f)) for i, f in unordered) == [(i, i) for i in range(50)]
+        assert [i for i, _ in video.readDict([1, 2, 40], workers=2)] == [1, 2, 40]
+
+        frame_bytes = 48 * 64 * 3
+        for workers, budget in ((2, 10), (4, 3), (3, 1000)):
+            chunk_size, max_pending = video._parallelBudget(workers, 256, budget * frame_bytes)
+            assert max_pending >= workers
+            assert chunk_size * (max_pending + 1) <= max(budget, workers + 1)
+        frames = video.readParallel(workers=2, max_bytes=10 * frame_bytes)
+        assert [(i, _value(f)) for i, f in frames] == [(i, i) for i in range(50)]
+
+
+def test_section(video_file):
+    from zdl.utils.media.video import Video
+
+    with Video(video_file) as video:
+        sections, distances = video.section(range_=range(10, 20), scale=0.5)
+    assert sections.tolist() == [[i, i] for i in range(10, 20)]
+    assert distances.shape == (9, 3)
+
+
+def test_read_stride_size_gray(video_file):
+    from zdl.utils.media.video import Video
+
+    with Video(video_file) as video:
+        frames = list(video.readDict(stride=10, size=(-1, 24), gray=True))
+        assert [(i, _value(f)) for i, f in frames] == [(i, i) for i in range(0, 50, 10)]
+        assert frames[0][1].shape == (24, 32)
+        assert len(video.frame_cache) == 0
+        assert video.readFrame(7, need_type=None, size=(16, 12)).shape == (12, 16, 3)
+        assert [f.shape for _, f in video.readDict([1, 9], prefetch=2, size=(8, 6))] == [(6, 8, 3)] * 2
+
+
+def test_info_cache(video_file, tmp_path):
+    import os
+    from zdl.utils.media.video import Video, VideoInfoCache
+
+    info_cache = VideoInfoCache(str(tmp_path / 'info.json'))
+    info = Video(video_file, info_cache=info_cache).getInfo()
+    assert (info['frame_c'], info['shape'], info['fps']) == (50, (48, 64, 3), 25)
+    # written in batches, not per video
+    assert not os.path.exists(info_cache.path)
+    info_cache.dump()
+    assert VideoInfoCache(info_cache.path).get(video_file)['frame_c'] == 50
+    assert Video(video_file, info_cache=VideoInfoCache(info_cache.path)).getInfo() == info
+
+
+def test_video_writer(video_file, tmp_path):
+    import numpy as np
+    from zdl.utils.media.image import ImageCV
+    from zdl.utils.media.video import Video, VideoWriter
+
+    out = str(tmp_path / 'out.avi')
+    with Video(video_file) as video, VideoWriter(out, fourcc='MJPG', source=video, queue_size=2) as writer:
+        for i, frame in video.readDict(range(10)):
+            writer.write(ImageCV(frame) if i % 2 else frame)
+        writer.write(np.zeros((10, 10), dtype=np.uint8))
+    assert writer.frame_c == 11
+    with Video(out, info_cache=False) as written:
+        assert written.getInfo()['frame_c'] == 11
+        assert abs(written.readFrame(9, need_type=None).mean() - 36) < 4
+
+
+def test_video_writer_copy_detaches_image_cv(tmp_path):
+    import numpy as np
+    from zdl.utils.media.image import ImageCV
+    from zdl.utils.media.video import Video, VideoWriter
+
+    out = str(tmp_path / 'copy.avi')
+    img = ImageCV(np.full((48, 64, 3), 200, dtype=np.uint8))
+    with VideoWriter(out, fps=10, size=(64, 48), fourcc='MJPG', queue_size=64) as writer:
+        for _ in range(20):
+            writer.write(img)
+            # drawing in place on the caller's buffer must not reach queued frames
+            img.org().fill(0)
+            img.org().fill(200)
+        img.org().fill(0)
+    with Video(out, info_cache=False) as written:
+        assert all(abs(frame.mean() - 200) < 4 for _, frame in written.readDict())
+
+
+def test_export_raw(video_file, tmp_path):
+    import pickle
+    from zdl.utils.media.raw_video import RawVideo
+    from zdl.utils.media.video import Video
+
+    path = str(tmp_path / 'frames.zraw')
+    with Video(video_file) as video:
+        raw = video.exportRaw(path, stride=2, size=(32, -1), flush_every=4)
+        expected = [f for _, f in video.readDict(stride=2, size=(32, -1))]
+    info = raw.getInfo()
+    assert (info['frame_c'], info['shape'], info['fps']) == (25, (24, 32, 3), 12.5)
+    assert (raw.readFrame(7, need_type=None) == expected[7]).all()
+    assert raw._readAt(25) is None and raw._readAt(-1) is None
+    assert [i for i, _ in raw.readDict([3, 1], prefetch=2)] == [1, 3]
+    assert (pickle.loads(pickle.dumps(raw)).readFrame(24, need_type=None) == expected[24]).all()
+    assert RawVideo(path).section()[0].shape == (25, 2)
@@ -6,7 +6,6 @@ import cv2
 import numpy as np
 from zdl.utils.io.log import logger
 from zdl.utils.media.image import ImageCV
-from zdl.utils.media.point import Point
 
 from zdl.AI.pose_estimation.pose.base_pose import Poses, BasePose
 
@@ -26,6 +25,7 @@ class DatumPickleable:
             'poseKeypoints': self.poseKeypoints,
             'cvInputData': self.cvInputData,
             'cvOutputData': self.cvOutputData,
+            'poseKeypoints_stable': self.poseKeypoints_stable,
         }
         return state
 
@@ -33,6 +33,7 @@ class DatumPickleable:
         self.poseKeypoints = state['poseKeypoints']
         self.cvInputData = state['cvInputData']
         self.cvOutputData = state['cvOutputData']
+        self.poseKeypoints_stable = state.get('poseKeypoints_stable')
 
     def showState(self):
         logger.debug(self.poseKeypoints)
@@ -67,15 +68,22 @@ class DatumPickleable:
                     (102, 0, 255), 2, cv2.LINE_AA, False)
 
     def centers(self, need_type=list):
-        clean_pose = self.poseKeypoints.copy()
-        Poses(clean_pose, pose_type=self.model_type).cleanup(['face', 'feet'])
-        return Point.pointsCenter(clean_pose, need_type=need_type)
+        # face and feet are cleaned on Poses' own copy, poseKeypoints is untouched
+        return Poses(self.poseKeypoints, pose_type=self.model_type).centers(need_type)
+
+    def stabilize(self, smoother, ids=None):
+        """ Fill poseKeypoints_stable by a smoother of zdl.AI.pose_estimation.smoothing, with the inherit flag column.
+
+        :param ids: track ids of the people, e.g. from PoseTracker, default their order.
+        """
+        self.poseKeypoints_stable = smoother.update(Poses(self.poseKeypoints, self.model_type), ids)
+        return self.poseKeypoints_stable
 
     def countNonzeroPoints(self):
         return [np.count_nonzero(np.count_nonzero(pose[:, :2], axis=1)) for pose in self.poseKeypoints]
 
     def poseKeypointsOrderByCenterX(self):
-        return self.poseKeypoints[np.argsort(self.centers())]
+        return self.poseKeypoints[np.argsort(self.centers(np.ndarray)[:, 0])]
 
     def poseKeypointsOrderByIntegrity(self):
         return sorted(self.poseKeypoints, key=lambda x: np.count_nonzero(x[:, 0]), reverse=True)
@@ -1 +1 @@
-__all__ = ['extractor', 'pose']
+__all__ = ['extractor', 'pose', 'smoothing', 'tracker']
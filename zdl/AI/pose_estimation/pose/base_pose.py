@@ -2,12 +2,76 @@ from abc import ABC, abstractmethod
 from typing import List, Type
 
 import numpy as np
-from numba import jit
+from numba import njit
 from zdl.utils.helper.numpy import ndarrayLen
 from zdl.utils.io.log import logger
 from zdl.utils.media.point import Point
 
 
+@njit(cache=True)
+def _pairDistance(pose1, pose2, euclidean):
+    # nan if no common point, the center fallback is left to the caller
+    total, worst, worst_dis, n = 0., -1., 0., 0
+    for k in range(pose1.shape[0]):
+        if euclidean:
+            if not (pose1[k, 2] > 0 and pose2[k, 2] > 0):
+                continue
+            dx, dy = pose1[k, 0] - pose2[k, 0], pose1[k, 1] - pose2[k, 1]
+            d = (dx * dx + dy * dy) ** 0.5
+            m = d
+        else:
+            if not ((pose1[k, 0] != 0 or pose1[k, 1] != 0) and (pose2[k, 0] != 0 or pose2[k, 1] != 0)):
+                continue
+            dx, dy = abs(pose1[k, 0] - pose2[k, 0]), abs(pose1[k, 1] - pose2[k, 1])
+            d = dx + dy
+            m = max(dx, dy)
+        total += d
+        n += 1
+        if m > worst:
+            worst, worst_dis = m, d
+    if n == 0:
+        return np.nan
+    if n > 1:
+        total -= worst_dis
+        n -= 1
+    return total / n if euclidean else total / (2 * n)
+
+
+@njit(cache=True)
+def _distanceMatrixKernel(poses1, poses2, euclidean):
+    result = np.empty((poses1.shape[0], poses2.shape[0]))
+    for i in range(poses1.shape[0]):
+        for j in range(poses2.shape[0]):
+            result[i, j] = _pairDistance(poses1[i], poses2[j], euclidean)
+    return result
+
+
+@njit(cache=True)
+def _centersKernel(key_points, excluded, positive):
+    # mean of the points with x or y positive (or nonzero), skipping excluded ones, (0, 0) if none
+    centers = np.zeros((key_points.shape[0], 2))
+    for p in range(key_points.shape[0]):
+        sx, sy, n = 0., 0., 0
+        for k in range(key_points.shape[1]):
+            x, y = key_points[p, k, 0], key_points[p, k, 1]
+            if excluded[k] or not ((x > 0 or y > 0) if positive else (x != 0 or y != 0)):
+                continue
+            sx += x
+            sy += y
+            n += 1
+        if n:
+            centers[p, 0], centers[p, 1] = sx / n, sy / n
+    return centers
+
+
+def _asBatch(poses) -> np.ndarray:
+    # contiguous float64 (P, K, 3), a single (K, C) pose is a batch of one, extra columns are dropped
+    poses = np.asarray(poses)
+    if poses.ndim == 2:
+        poses = poses[np.newaxis]
+    return np.ascontiguousarray(poses[..., :3], dtype=np.float64)
+
+
 class BasePose(ABC):
     def __init__(self, key_points: np.ndarray, add_inherit_flag_col: bool = True):
         assert key_points.ndim == 2, f'Should be a 2D pose! shape: {key_points.shape}'
@@ -41,7 +105,7 @@ class BasePose(ABC):
         shape = pose_keypoints.shape
         if shape == () or shape and shape[-1] == cls.SHAPE[-1] + 1: return pose_keypoints
         append_shape = *shape[:-1], 1
-        result = np.concatenate((pose_keypoints, np.zeros(append_shape, dtype=pose_keypoints.dtype)), axis=1)
+        result = np.concatenate((pose_keypoints, np.zeros(append_shape, dtype=pose_keypoints.dtype)), axis=-1)
         return result
 
     # TODO: switch to abstract
@@ -113,75 +177,167 @@ class BasePose(ABC):
         return func(self.key_points, another.key_points)
 
     @classmethod
-    # @jit
-    def manhattanDistance(cls, pose1, pose2):
-        pose1, pose2 = np.asarray(pose1), np.asarray(pose2)
-        pose1_nonzero_b, pose2_nonzero_b = pose1 != 0, pose2 != 0
-        pose1_x_or_y_nonzero = np.logical_or(pose1_nonzero_b[..., 0], pose1_nonzero_b[..., 1])
-        pose2_x_or_y_nonzero = np.logical_or(pose2_nonzero_b[..., 0], pose2_nonzero_b[..., 1])
-        pose1_pose2_xy_nonzero = np.logical_and(pose1_x_or_y_nonzero, pose2_x_or_y_nonzero)
-        if np.any(pose1_pose2_xy_nonzero):
-            dis = abs((pose1 - pose2)[..., :2])
-            # Remove the maximum
-            r, c = np.unravel_index(np.argmax(dis, axis=None), dis.shape)
-            pose1_pose2_xy_nonzero[r] = False
-            mean_dis = dis[pose1_pose2_xy_nonzero].mean()
+    def centersOf(cls, key_points: np.ndarray) -> np.ndarray:
+        """ (P, K, C) -> (P, 2), the same as center() of every pose: nonzero points except face and feet. """
+        excluded = np.zeros(cls.SHAPE[0], dtype=np.bool_)
+        excluded[[i for part in ['face', 'feet'] for i in cls.PARTS_INDICES[part]]] = True
+        return _centersKernel(_asBatch(key_points), excluded, True)
+
+    @classmethod
+    def _fillCenterDistances(cls, result, poses1, poses2, algorithm):
+        no_common = np.isnan(result)
+        if not np.any(no_common):
+            return result
+        logger.debug("Poses haven't same nonzero index points, change to use center point dis!")
+        if algorithm == 'Manhattan':
+            included = np.zeros(poses1.shape[1], dtype=np.bool_)
+            centers1, centers2 = _centersKernel(poses1, included, False), _centersKernel(poses2, included, False)
+            center_dis = np.abs(centers1[:, np.newaxis] - centers2[np.newaxis]).sum(axis=-1) / 2
         else:
-            logger.debug("Poses haven't same nonzero index points, change to use center point dis!")
-            pose1_x_mean, pose1_y_mean = np.split(pose1[..., :2][pose1_x_or_y_nonzero].mean(axis=0), 2, axis=0) \
-                                             if np.any(pose1_x_or_y_nonzero) else [0], [0]
-            pose2_x_mean, pose2_y_mean = np.split(pose2[..., :2][pose2_x_or_y_nonzero].mean(axis=0), 2, axis=0) \
-                                             if np.any(pose2_x_or_y_nonzero) else [0], [0]
-            mean_dis = (pose1_x_mean[0] - pose2_x_mean[0] + pose1_y_mean[0] - pose2_y_mean[0]) / 2
-        return mean_dis
+            centers1, centers2 = cls.centersOf(poses1), cls.centersOf(poses2)
+            center_dis = np.sqrt(((centers1[:, np.newaxis] - centers2[np.newaxis]) ** 2).sum(axis=-1))
+        result[no_common] = center_dis[no_common]
+        return result
 
     @classmethod
-    @jit
-    def euclideanDistance(cls, pose1, pose2):
-        pose1xy, pose2xy = pose1[..., :2], pose2[..., :2]
-        pose1_positive, pose2_positive = pose1[..., 2] > 0, pose2[..., 2] > 0
-        pose1_pose2_positive = np.logical_and(pose1_positive, pose2_positive)
-        pose1_pose2_positive_num = pose1_pose2_positive.sum()
-        if pose1_pose2_positive_num:
-            # Remove the maximum
-            x2_plus_y2 = (pose1xy - pose2xy) ** 2
-            dis_sum = (x2_plus_y2[..., 0] + x2_plus_y2[..., 1]) ** 0.5
-            dis_sum_max = dis_sum.max()
-            mean_dis = (dis_sum[pose1_pose2_positive].sum() - dis_sum_max) / (pose1_pose2_positive_num - 1)
+    def distanceMatrix(cls, poses1: np.ndarray, poses2: np.ndarray, algorithm='Manhattan') -> np.ndarray:
+        """ Distances between every pose of (P, K, C) poses1 and (Q, K, C) poses2, a (P, Q) array.
+
+        Manhattan: mean |dx|, |dy| over the points nonzero in both poses, the point holding the largest
+        coordinate distance is dropped as an outlier if more than one is common. Without common points,
+        (|dx| + |dy|) / 2 of the nonzero points means.
+        Euclidean: the same over points of positive confidence in both, without common points the distance
+        of the pose centers.
+        """
+        if algorithm not in ('Manhattan', 'Euclidean'):
+            raise Exception
+        poses1, poses2 = _asBatch(poses1), _asBatch(poses2)
+        result = _distanceMatrixKernel(poses1, poses2, algorithm == 'Euclidean')
+        return cls._fillCenterDistances(result, poses1, poses2, algorithm)
+
+    @classmethod
+    def distanceMatrixNumpy(cls, poses1: np.ndarray, poses2: np.ndarray, algorithm='Manhattan') -> np.ndarray:
+        # the NumPy broadcasting version of distanceMatrix, kept as reference and for benchmarking
+        poses1, poses2 = _asBatch(poses1), _asBatch(poses2)
+        if algorithm == 'Manhattan':
+            mask1 = np.logical_or(poses1[..., 0] != 0, poses1[..., 1] != 0)
+            mask2 = np.logical_or(poses2[..., 0] != 0, poses2[..., 1] != 0)
+            # (P, Q, K, 2)
+            dis = np.abs(poses1[:, np.newaxis, :, :2] - poses2[np.newaxis, :, :, :2])
+            point_dis, point_max = dis.sum(axis=-1), dis.max(axis=-1)
+            values_per_point = 2
+        elif algorithm == 'Euclidean':
+            mask1, mask2 = poses1[..., 2] > 0, poses2[..., 2] > 0
+            diff = poses1[:, np.newaxis, :, :2] - poses2[np.newaxis, :, :, :2]
+            point_dis = np.sqrt((diff ** 2).sum(axis=-1))
+            point_max = point_dis
+            values_per_point = 1
         else:
-            logger.debug("Poses haven't same nonzero index points, change to use center point dis!")
-            mean_dis = Point.dis(cls(pose1).center(), cls(pose2).center())
-        return mean_dis
+            raise Exception
+        common = np.logical_and(mask1[:, np.newaxis], mask2[np.newaxis])
+        common_c = common.sum(axis=-1)
+        total = np.where(common, point_dis, 0).sum(axis=-1)
+        drop = common_c > 1
+        dropped_at = np.argmax(np.where(common, point_max, -np.inf), axis=-1)
+        total -= drop * np.take_along_axis(point_dis, dropped_at[..., np.newaxis], axis=-1)[..., 0]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = total / ((common_c - drop) * values_per_point)
+        return cls._fillCenterDistances(result, poses1, poses2, algorithm)
+
+    @classmethod
+    def manhattanDistance(cls, pose1, pose2):
+        return float(cls.distanceMatrix(pose1, pose2, 'Manhattan')[0, 0])
+
+    @classmethod
+    def euclideanDistance(cls, pose1, pose2):
+        return float(cls.distanceMatrix(pose1, pose2, 'Euclidean')[0, 0])
 
 
 class Poses:
+    """ All people of a frame in one contiguous (P, K, C + 1) array, the last column is the inherit flag.
+
+    BasePose objects are only built on access, as views into the array, so changing one changes the other.
+    """
+
     def __init__(self, all_keypoints, pose_type: Type[BasePose]):
         """
 
-        :param all_keypoints:
+        :param all_keypoints: (P, K, C) array, or a shape () array when nobody is found, like openpose gives.
         :param pose_type: class - body25.BODY25 etc.
         """
+        all_keypoints = np.asarray(all_keypoints)
         assert all_keypoints.ndim in [0, 3], 'poses shape error!'
         self.all_keypoints = all_keypoints
         self.pose_type = pose_type
-        self.poses = [pose_type(keypoints) for keypoints in all_keypoints] if all_keypoints.ndim == 3 else []
+        if all_keypoints.ndim == 3:
+            self.key_points = pose_type.addInheritFlagCol(all_keypoints)
+        else:
+            self.key_points = np.zeros((0, pose_type.SHAPE[0], pose_type.SHAPE[1] + 1), dtype=np.float32)
+        self._poses = [None] * len(self.key_points)
 
     def __iter__(self):
-        return iter(self.poses)
+        return (self[i] for i in range(len(self)))
 
     def __getitem__(self, i):
-        return self.poses[i]
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if self._poses[i] is None:
+            self._poses[i] = self.pose_type(self.key_points[i], add_inherit_flag_col=False)
+        return self._poses[i]
 
     def __len__(self):
-        return len(self.poses)
+        return len(self.key_points)
+
+    @property
+    def poses(self) -> List[BasePose]:
+        return list(self)
 
     @property
     def PARTS_INDICES(self):
         return self.pose_type.PARTS_INDICES
 
-    def cleanup(self, body_parts: List):
-        for pose in self.poses:
-            pose.cleanup(body_parts)
+    def _partsIndices(self, body_parts: List):
+        return [i for part in body_parts for i in self.PARTS_INDICES[part]]
+
+    def cleanup(self, body_parts: List, copy=False):
+        """ Zero the body parts of everybody, in place, or on a returned copy of the array if `copy`. """
+        cleaning = self.key_points.copy() if copy else self.key_points
+        cleaning[:, self._partsIndices(body_parts)] = 0
+        if copy:
+            return cleaning
+        for pose in self._poses:
+            if pose is not None:
+                pose._center = None
+        return self
 
     def centers(self, need_type=list):
-        return [pose.center(need_type) for pose in self.poses]
+        """ Mean of the nonzero points except face and feet per person, (0, 0) if none, like BasePose.center.
+
+        :param need_type: list/tuple/None(Point) per person, or np.ndarray for a (P, 2) array.
+        """
+        centers = self.pose_type.centersOf(self.key_points)
+        if need_type is np.ndarray:
+            return centers
+        if need_type == list:
+            return centers.tolist()
+        if need_type == tuple:
+            return [tuple(c) for c in centers.tolist()]
+        return [Point(*c) for c in centers.tolist()]
+
+    def distanceMatrix(self, another: 'Poses', algorithm='Manhattan') -> np.ndarray:
+        """ (len(self), len(another)) distances, see BasePose.distanceMatrix. """
+        return self.pose_type.distanceMatrix(self.key_points, another.key_points, algorithm)
+
+    def shoulderBreadth(self) -> np.ndarray:
+        r_shoulder, l_shoulder = self.PARTS_INDICES['shoulder']
+        r_x, l_x = self.key_points[:, r_shoulder, 0], self.key_points[:, l_shoulder, 0]
+        return np.where((r_x > 0) & (l_x > 0), np.abs(r_x - l_x), 0)
+
+    def torsoHeight(self) -> np.ndarray:
+        indices = self.PARTS_INDICES
+        shoulder_y = self.key_points[:, [indices['shoulder'][0], indices['shoulder'][-1]], 1]
+        crotch_y = self.key_points[:, [indices['crotch'][0], indices['crotch'][-1]], 1]
+        # right and left heights, the mean of both if both are found, else the found one
+        heights = np.where((shoulder_y > 0) & (crotch_y > 0), np.abs(shoulder_y - crotch_y), 0)
+        found = (heights > 0).sum(axis=1)
+        return heights.sum(axis=1) / np.maximum(found, 1)
@@ -0,0 +1,201 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Type, Union
+
+import numpy as np
+
+from zdl.AI.pose_estimation.pose.base_pose import BasePose, Poses
+
+_NEVER = np.iinfo(np.int64).max // 2
+
+
+class KeypointSmoother(ABC):
+    """ Online temporal smoothing of keypoints, one state per track, vectorized over people and joints.
+
+    A (0, 0) keypoint is missing: it is skipped, and the filter of that joint restarts from the next
+    observation. Confidence and the inherit flag column pass through. With `inherit_max`, a joint missing
+    for at most that many frames is filled with its last output and flagged 1 in the inherit flag column.
+
+    Example:
+        >> smoother = OneEuroSmoother(BODY25, fps=30, inherit_max=3)
+        >> for poses in frames_poses:
+        >>     ids = tracker.update(poses)
+        >>     stable = smoother.update(poses, ids)
+        >>     smoother.drop(tracker.ended)
+    """
+    STATE = ()
+
+    def __init__(self, pose_type: Type[BasePose], fps=30., inherit_max=0):
+        self.pose_type = pose_type
+        self.dt = 1. / fps
+        self.inherit_max = inherit_max
+        self.reset()
+
+    def reset(self):
+        self._rows: Dict[int, int] = {}
+        self._free = []
+        self._state = {name: np.zeros((0, self.pose_type.SHAPE[0], 2)) for name in self.STATE}
+        self._missing = np.zeros((0, self.pose_type.SHAPE[0]), dtype=np.int64)
+        self._last = None
+        return self
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _grow(self, capacity):
+        extra = capacity - len(self._missing)
+        for name, state in self._state.items():
+            self._state[name] = np.concatenate([state, np.zeros((extra, *state.shape[1:]))])
+        self._missing = np.concatenate([self._missing, np.full((extra, self._missing.shape[1]), _NEVER)])
+        if self._last is not None:
+            self._last = np.concatenate([self._last, np.zeros((extra, *self._last.shape[1:]), self._last.dtype)])
+
+    def _rowsOf(self, ids) -> np.ndarray:
+        rows = []
+        for track_id in ids:
+            track_id = int(track_id)
+            if track_id not in self._rows:
+                if not self._free:
+                    capacity = len(self._missing)
+                    self._grow(max(capacity * 2, 8))
+                    self._free.extend(range(len(self._missing) - 1, capacity - 1, -1))
+                row = self._free.pop()
+                self._missing[row] = _NEVER
+                self._rows[track_id] = row
+            rows.append(self._rows[track_id])
+        return np.asarray(rows, dtype=np.int64)
+
+    def drop(self, ids: Iterable[int]):
+        """ Forget ended tracks, their rows are reused. """
+        for track_id in ids:
+            row = self._rows.pop(int(track_id), None)
+            if row is not None:
+                self._free.append(row)
+        return self
+
+    @abstractmethod
+    def _step(self, rows: np.ndarray, xy: np.ndarray, present: np.ndarray, fresh: np.ndarray, dt) -> np.ndarray:
+        """ Update the states of rows with the (P, K, 2) observations, fresh joints restart from them.
+
+        :return: (P, K, 2) smoothed positions, only read where present.
+        """
+        pass
+
+    def update(self, poses: Union[Poses, np.ndarray], ids=None, dt=None) -> np.ndarray:
+        """
+        :param poses: Poses, or (P, K, C) keypoints of a frame, with or without the inherit flag column.
+        :param ids: (P,) track ids, e.g. from PoseTracker, default 0..P-1 for a stable order.
+        :param dt: seconds since the previous frame, default 1 / fps.
+        :return: smoothed (P, K, C) copy
+        """
+        key_points = poses.key_points if isinstance(poses, Poses) else np.asarray(poses)
+        if key_points.ndim != 3 or len(key_points) == 0:
+            return np.array(key_points, copy=True)
+        out = np.array(key_points, dtype=np.float64)
+        rows = self._rowsOf(np.arange(len(out)) if ids is None else ids)
+        if self._last is None or self._last.shape[-1] != out.shape[-1]:
+            self._last = np.zeros((len(self._missing), out.shape[1], out.shape[2]))
+        xy = out[..., :2]
+        present = np.logical_or(xy[..., 0] != 0, xy[..., 1] != 0)
+        fresh = present & (self._missing[rows] != 0)
+        smoothed = self._step(rows, xy, present, fresh, self.dt if dt is None else dt)
+        out[..., :2] = np.where(present[..., np.newaxis], smoothed, 0)
+
+        missing = np.where(present, 0, self._missing[rows] + 1)
+        self._missing[rows] = missing
+        if self.inherit_max:
+            inherit = ~present & (missing <= self.inherit_max)
+            flag_col = self.pose_type.SHAPE[1]
+            last = self._last[rows]
+            out[inherit] = last[inherit]
+            if out.shape[-1] > flag_col:
+                out[..., flag_col][inherit] = 1
+        self._last[rows] = np.where(present[..., np.newaxis], out, self._last[rows])
+        return out.astype(key_points.dtype)
+
+    def smooth(self, sequence: np.ndarray) -> np.ndarray:
+        """ Offline smoothing of (T, P, K, C) keypoints, person p being track p in every frame. """
+        self.reset()
+        return np.stack([self.update(frame) for frame in np.asarray(sequence)])
+
+
+class EMASmoother(KeypointSmoother):
+    STATE = ('x',)
+
+    def __init__(self, pose_type: Type[BasePose], alpha=0.5, fps=30., inherit_max=0):
+        """
+        :param alpha: weight of the new observation
+        """
+        self.alpha = alpha
+        super().__init__(pose_type, fps, inherit_max)
+
+    def _step(self, rows, xy, present, fresh, dt):
+        x = self._state['x'][rows]
+        x = np.where(fresh[..., np.newaxis], xy, self.alpha * xy + (1 - self.alpha) * x)
+        self._state['x'][rows] = np.where(present[..., np.newaxis], x, self._state['x'][rows])
+        return x
+
+
+class OneEuroSmoother(KeypointSmoother):
+    """ The 1 Euro filter: smooth at rest, the cutoff rises with the speed so fast motion has little lag. """
+    STATE = ('x', 'dx')
+
+    def __init__(self, pose_type: Type[BasePose], min_cutoff=1., beta=0.007, d_cutoff=1., fps=30., inherit_max=0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        super().__init__(pose_type, fps, inherit_max)
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1. / (2 * np.pi * cutoff)
+        return 1. / (1. + tau / dt)
+
+    def _step(self, rows, xy, present, fresh, dt):
+        x_prev, dx_prev = self._state['x'][rows], self._state['dx'][rows]
+        dx = (xy - x_prev) / dt
+        a_d = self._alpha(self.d_cutoff, dt)
+        dx_hat = a_d * dx + (1 - a_d) * dx_prev
+        a = self._alpha(self.min_cutoff + self.beta * np.abs(dx_hat), dt)
+        x_hat = a * xy + (1 - a) * x_prev
+        restart = fresh[..., np.newaxis]
+        x_hat, dx_hat = np.where(restart, xy, x_hat), np.where(restart, 0, dx_hat)
+        keep = present[..., np.newaxis]
+        self._state['x'][rows] = np.where(keep, x_hat, x_prev)
+        self._state['dx'][rows] = np.where(keep, dx_hat, dx_prev)
+        return x_hat
+
+
+class KalmanSmoother(KeypointSmoother):
+    """ A constant velocity Kalman filter on every coordinate, with a 2 x 2 covariance each. """
+    STATE = ('x', 'v', 'p00', 'p01', 'p11')
+
+    def __init__(self, pose_type: Type[BasePose], process_noise=1e3, measurement_noise=4., fps=30., inherit_max=0):
+        """
+        :param process_noise: acceleration variance, pixels^2 / s^4
+        :param measurement_noise: keypoint position variance, pixels^2
+        """
+        self.q = process_noise
+        self.r = measurement_noise
+        super().__init__(pose_type, fps, inherit_max)
+
+    def _step(self, rows, xy, present, fresh, dt):
+        s = {name: state[rows] for name, state in self._state.items()}
+        # predict
+        x = s['x'] + s['v'] * dt
+        p00 = s['p00'] + dt * (2 * s['p01'] + dt * s['p11']) + self.q * dt ** 4 / 4
+        p01 = s['p01'] + dt * s['p11'] + self.q * dt ** 3 / 2
+        p11 = s['p11'] + self.q * dt ** 2
+        # update
+        k0, k1 = p00 / (p00 + self.r), p01 / (p00 + self.r)
+        innovation = xy - x
+        new = {'x': x + k0 * innovation, 'v': s['v'] + k1 * innovation,
+               'p00': (1 - k0) * p00, 'p01': (1 - k0) * p01, 'p11': p11 - k1 * p01}
+        restart = fresh[..., np.newaxis]
+        new['x'] = np.where(restart, xy, new['x'])
+        new['v'] = np.where(restart, 0, new['v'])
+        for name, init in (('p00', self.r), ('p01', 0), ('p11', self.r / dt ** 2)):
+            new[name] = np.where(restart, init, new[name])
+        keep = present[..., np.newaxis]
+        for name, value in new.items():
+            self._state[name][rows] = np.where(keep, value, s[name])
+        return new['x']
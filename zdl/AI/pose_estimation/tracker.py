@@ -0,0 +1,125 @@
+from typing import Iterable, Iterator, Tuple, Type, Union
+
+import numpy as np
+
+from zdl.AI.pose_estimation.pose.base_pose import BasePose, Poses
+from zdl.utils.io.log import logger
+
+
+def _assignGreedy(cost: np.ndarray, max_distance) -> Tuple[np.ndarray, np.ndarray]:
+    # cheapest pairs first, every row and column used once
+    rows, cols = np.unravel_index(np.argsort(cost, axis=None, kind='stable'), cost.shape)
+    row_used, col_used = np.zeros(cost.shape[0], dtype=bool), np.zeros(cost.shape[1], dtype=bool)
+    matched_rows, matched_cols = [], []
+    for r, c in zip(rows, cols):
+        if cost[r, c] > max_distance:
+            break
+        if row_used[r] or col_used[c]:
+            continue
+        row_used[r] = col_used[c] = True
+        matched_rows.append(r)
+        matched_cols.append(c)
+    return np.asarray(matched_rows, dtype=int), np.asarray(matched_cols, dtype=int)
+
+
+def _assignHungarian(cost: np.ndarray, max_distance) -> Tuple[np.ndarray, np.ndarray]:
+    try:
+        from scipy.optimize import linear_sum_assignment
+    except ImportError:
+        logger.warning('scipy not found, fall back to greedy assignment!')
+        return _assignGreedy(cost, max_distance)
+    # gated pairs cost more than any matched set, so they are only taken when nothing else is left
+    gated = cost > max_distance
+    big = (np.where(gated, 0, cost).sum() + 1) * 2
+    rows, cols = linear_sum_assignment(np.where(gated, big, cost))
+    keep = ~gated[rows, cols]
+    return rows[keep], cols[keep]
+
+
+class PoseTracker:
+    """ Persistent ids for the people of a video, frame by frame.
+
+    Live tracks are kept in arrays: their last poses (T, K, C + 1), ids, frames since last matched and
+    matched counts. Every frame the (T, P) distance matrix of tracks against people is assigned, pairs
+    farther than `max_distance` are never matched, unmatched people start new tracks, and tracks unmatched
+    for more than `max_age` frames end, their ids are in `ended` after the update.
+
+    Example:
+        >> tracker = PoseTracker(BODY25, max_distance=40)
+        >> for frame in frames:
+        >>     poses, datum = extractor.extract(frame)
+        >>     ids = tracker.update(poses)  # one id per person of poses
+        >>     smoother.drop(tracker.ended)
+    """
+
+    def __init__(self, pose_type: Type[BasePose], algorithm='Manhattan', max_distance=50., max_age=5,
+                 solver='hungarian'):
+        """
+        :param algorithm: 'Manhattan' / 'Euclidean', see BasePose.distanceMatrix
+        :param solver: 'hungarian' needs scipy, it falls back to 'greedy' without it.
+        """
+        assert solver in ('hungarian', 'greedy'), 'solver should be hungarian or greedy!'
+        self.pose_type = pose_type
+        self.algorithm = algorithm
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.solver = solver
+        self.reset()
+
+    def reset(self):
+        k, c = self.pose_type.SHAPE
+        self.key_points = np.zeros((0, k, c + 1), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.ages = np.zeros(0, dtype=np.int64)
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.ended = np.zeros(0, dtype=np.int64)
+        self._next_id = 0
+        return self
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _keyPoints(self, poses: Union[Poses, np.ndarray]) -> np.ndarray:
+        if isinstance(poses, Poses):
+            return poses.key_points
+        return Poses(np.asarray(poses), self.pose_type).key_points
+
+    def _assign(self, cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if cost.size == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        if self.solver == 'hungarian':
+            return _assignHungarian(cost, self.max_distance)
+        return _assignGreedy(cost, self.max_distance)
+
+    def update(self, poses: Union[Poses, np.ndarray]) -> np.ndarray:
+        """
+        :param poses: Poses, or a (P, K, C) / shape () array of a frame
+        :return: (P,) track ids of the people in order. Ids of the tracks ended by this update are in `ended`.
+        """
+        key_points = self._keyPoints(poses)
+        cost = self.pose_type.distanceMatrix(self.key_points, key_points, self.algorithm) \
+            if len(self) and len(key_points) else np.zeros((len(self), len(key_points)))
+        rows, cols = self._assign(cost)
+
+        person_ids = np.full(len(key_points), -1, dtype=np.int64)
+        person_ids[cols] = self.ids[rows]
+        self.key_points[rows] = key_points[cols]
+        self.ages += 1
+        self.ages[rows] = 0
+        self.hits[rows] += 1
+
+        alive = self.ages <= self.max_age
+        self.ended = self.ids[~alive]
+        births = np.setdiff1d(np.arange(len(key_points)), cols)
+        new_ids = np.arange(self._next_id, self._next_id + len(births))
+        self._next_id += len(births)
+        person_ids[births] = new_ids
+        self.key_points = np.concatenate([self.key_points[alive], key_points[births]]).astype(np.float32)
+        self.ids = np.concatenate([self.ids[alive], new_ids])
+        self.ages = np.concatenate([self.ages[alive], np.zeros(len(births), dtype=np.int64)])
+        self.hits = np.concatenate([self.hits[alive], np.ones(len(births), dtype=np.int64)])
+        return person_ids
+
+    def track(self, frames_poses: Iterable[Union[Poses, np.ndarray]]) -> Iterator[np.ndarray]:
+        for poses in frames_poses:
+            yield self.update(poses)
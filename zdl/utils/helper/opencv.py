@@ -3,8 +3,37 @@ from typing import Optional
 import cv2
 
 
+def scanFrames(vname: Optional[str] = None, cap: Optional[cv2.VideoCapture] = None):
+    # exact but slow, grab() every frame from the beginning, the position is left at the end
+    cap = cap or cv2.VideoCapture(vname)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    count = 0
+    while cap.grab():
+        count += 1
+    return count
+
+
 def countFrames(vname: Optional[str] = None, cap: Optional[cv2.VideoCapture] = None):
+    """
+    Read the frame count from container properties, fall back to scanFrames when the container doesn't tell.
+    """
     cap = cap or cv2.VideoCapture(vname)
-    cap.set(cv2.CAP_PROP_POS_AVI_RATIO, 1)
-    count = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if count <= 0:
+        count = scanFrames(cap=cap)
     return count
+
+
+def probeVideo(vname: Optional[str] = None, cap: Optional[cv2.VideoCapture] = None):
+    """
+    Video metadata from container properties, no frame is decoded.
+    :return: {'frame_c', 'fps', 'width', 'height', 'channels'}
+    """
+    cap = cap or cv2.VideoCapture(vname)
+    assert cap.isOpened(), f'{vname} can not be opened!'
+    return {'frame_c': countFrames(cap=cap),
+            'fps': cap.get(cv2.CAP_PROP_FPS),
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            # VideoCapture converts frames to BGR by default
+            'channels': 3}
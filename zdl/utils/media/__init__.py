@@ -1 +1 @@
-__all__ = ['image', 'media', 'point', 'video']
+__all__ = ['dataset', 'draw', 'frame_cache', 'frame_ring', 'image', 'media', 'phash', 'point', 'raw_video', 'roi', 'segment', 'stats', 'tiled', 'video']
@@ -0,0 +1,104 @@
+import glob
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from zdl.utils.io.log import logger
+from zdl.utils.media.image import ImageCV, ImageStack
+from zdl.utils.media.media import IMG_SUFFIXES
+
+
+class ImageFolder:
+    """ Images of a directory or a glob pattern, decoded by a thread pool ahead of the consumer.
+
+    cv2 releases the GIL while decoding, so threads decode in parallel. At most `prefetch` images are
+    decoded and not yet consumed.
+
+    Example:
+        >> for img in ImageFolder('photos/', workers=8, reduce=2):
+        >>     detector.detect(img.org())
+        >> for stack in ImageFolder('photos/**/*.jpg', size=(320, 320)).batches(32):
+        >>     stack.org()  # (32, 320, 320, 3)
+    """
+
+    def __init__(self, source, recursive=False, workers=4, prefetch=16, ordered=True, reduce=1, gray=False,
+                 size: Optional[Tuple[int, int]] = None):
+        """
+        :param source: a directory, or a glob pattern, files are filtered by IMG_SUFFIXES.
+        :param recursive: walk sub directories of a directory source, `**` in a pattern works anyway.
+        :param prefetch: most images decoded and not yet consumed, at least `workers` to keep them all busy.
+        :param ordered: yield in path order, else as soon as decoded.
+        :param reduce, gray: see ImageCV.
+        :param size: (width, height) to resize every image to, needed by batches() when shapes differ.
+        """
+        assert prefetch >= workers, 'prefetch should be at least workers!'
+        if os.path.isdir(source):
+            pattern = os.path.join(source, '**', '*') if recursive else os.path.join(source, '*')
+        else:
+            pattern = source
+        self.paths = sorted(p for p in glob.glob(pattern, recursive=True)
+                            if Path(p).suffix in IMG_SUFFIXES and os.path.isfile(p))
+        self.workers = workers
+        self.prefetch = prefetch
+        self.ordered = ordered
+        self.reduce = reduce
+        self.gray = gray
+        self.size = size
+
+    def __len__(self):
+        return len(self.paths)
+
+    def _load(self, path) -> Optional[ImageCV]:
+        img = ImageCV(path, reduce=self.reduce, gray=self.gray)
+        if img.org().ndim < 2:
+            logger.warning(f'{path} decode failed, skipped!')
+            return None
+        if self.size is not None and tuple(self.size) != (img.org().shape[1], img.org().shape[0]):
+            img.apply(lambda a: cv2.resize(a, tuple(self.size), interpolation=cv2.INTER_AREA))
+        return img
+
+    def __iter__(self) -> Iterator[ImageCV]:
+        executor = ThreadPoolExecutor(self.workers)
+        running = deque()
+        try:
+            paths = iter(self.paths)
+            running.extend(executor.submit(self._load, p) for p in islice(paths, self.prefetch))
+            while running:
+                if self.ordered:
+                    done = running.popleft()
+                else:
+                    done = next(iter(wait(running, return_when=FIRST_COMPLETED).done))
+                    running.remove(done)
+                for path in islice(paths, 1):
+                    running.append(executor.submit(self._load, path))
+                img = done.result()
+                if img is not None:
+                    yield img
+        finally:
+            # not shutdown(cancel_futures=True), which needs python 3.9
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def batches(self, batch_size=32) -> Iterator[ImageStack]:
+        """ ImageStacks of batch_size images, labeled by path, the last one may be smaller. """
+        batch = []
+        for img in self:
+            batch.append(img)
+            if len(batch) == batch_size:
+                yield self._stack(batch)
+                batch = []
+        if batch:
+            yield self._stack(batch)
+
+    @staticmethod
+    def _stack(batch) -> ImageStack:
+        shapes = set(img.org().shape for img in batch)
+        assert len(shapes) == 1, f'images of different shapes {shapes}, set size to batch them!'
+        return ImageStack(np.stack([img.org() for img in batch]), [img.fname for img in batch])
@@ -0,0 +1,102 @@
+import colorsys
+import zlib
+from collections import OrderedDict
+from typing import List, Tuple, Sequence, Optional
+
+import cv2
+import numpy as np
+
+from zdl.utils.media.rect import Rect
+
+
+def _palette(n=64):
+    # well separated hues by the golden ratio, bright enough for black label text
+    colors = []
+    for i in range(n):
+        h = (i * 0.618033988749895) % 1
+        r, g, b = colorsys.hsv_to_rgb(h, 0.65 + 0.35 * (i % 2), 0.95)
+        colors.append((int(b * 255), int(g * 255), int(r * 255)))
+    return colors
+
+
+class BboxRenderer:
+    """ Draws labeled bboxes, the same label text always gets the same color.
+
+    A label is rasterized once per (text, color) into a sprite, later draws only paste it, and only the
+    box outlines and label regions of the canvas are touched.
+
+    Example:
+        >> renderer = BboxRenderer()
+        >> renderer.draw(frame, [(rect, 'person 0.93', 'person')], copy=False)
+    """
+    PALETTE = _palette()
+
+    def __init__(self, thickness=3, font_face=cv2.FONT_HERSHEY_TRIPLEX, font_scale=0.6, label_h=25,
+                 sprite_cache_size=1024):
+        self.thickness = thickness
+        self.font_face = font_face
+        self.font_scale = font_scale
+        self.label_h = label_h
+        self.sprite_cache_size = sprite_cache_size
+        self._sprites = OrderedDict()
+
+    def colorOf(self, key: str) -> Tuple[int, int, int]:
+        """ BGR color of a class name or label, stable across runs. """
+        return self.PALETTE[zlib.crc32(str(key).encode('utf8')) % len(self.PALETTE)]
+
+    def _sprite(self, text: str, color, channels: int) -> np.ndarray:
+        key = (text, color, channels)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            return sprite
+        label_w = len(text) * 12
+        if channels == 1:
+            sprite = np.full((self.label_h, label_w), int(np.mean(color)), dtype=np.uint8)
+        else:
+            sprite = np.empty((self.label_h, label_w, channels), dtype=np.uint8)
+            sprite[:] = (color + (255,) * channels)[:channels]
+        cv2.putText(sprite, text, org=(self.thickness // 2 + 1, self.label_h - 5), fontFace=self.font_face,
+                    fontScale=self.font_scale, color=(0, 0, 0), lineType=cv2.LINE_AA)
+        self._sprites[key] = sprite
+        if len(self._sprites) > self.sprite_cache_size:
+            self._sprites.popitem(last=False)
+        return sprite
+
+    @staticmethod
+    def _paste(canvas: np.ndarray, sprite: np.ndarray, x: int, y: int):
+        h, w = canvas.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + sprite.shape[1], w), min(y + sprite.shape[0], h)
+        if x0 < x1 and y0 < y1:
+            canvas[y0:y1, x0:x1] = sprite[y0 - y:y1 - y, x0 - x:x1 - x]
+
+    def draw(self, img: np.ndarray, bbox_entities: Sequence[Tuple], copy=True, out: Optional[np.ndarray] = None):
+        """
+        :param bbox_entities: (rect, label) or (rect, label, color_key), color_key defaults to the label.
+        :param copy: draw on a copy, else in place.
+        :param out: preallocated buffer to draw into, img is copied there first, `copy` is ignored.
+        :return: the canvas drawn
+        """
+        if out is not None:
+            np.copyto(out, img)
+            canvas = out
+        else:
+            canvas = img.copy() if copy else img
+        channels = 1 if canvas.ndim == 2 else canvas.shape[2]
+        for entity in bbox_entities:
+            bbox, label = entity[:2]
+            color = self.colorOf(entity[2] if len(entity) > 2 else label)
+            x, y, w, h = map(int, bbox.toInt().xywh) if isinstance(bbox, Rect) else map(int, bbox)
+            draw_color = int(np.mean(color)) if channels == 1 else color
+            cv2.rectangle(canvas, rec=(x, y, w, h), color=draw_color, thickness=self.thickness)
+            self._paste(canvas, self._sprite(str(label), color, channels),
+                        x - self.thickness // 2 - 1, max(0, y - self.label_h))
+        return canvas
+
+    def drawBatch(self, frames, bbox_entities_list: Sequence[Sequence[Tuple]], copy=True,
+                  out: Optional[np.ndarray] = None) -> List[np.ndarray]:
+        """ Draw many frames sharing the sprite cache, `out` is a preallocated (N, H, W[, C]) buffer. """
+        assert len(frames) == len(bbox_entities_list), 'one bbox_entities per frame!'
+        return [self.draw(frame, entities, copy, None if out is None else out[n])
+                for n, (frame, entities) in enumerate(zip(frames, bbox_entities_list))]
@@ -0,0 +1,154 @@
+from abc import abstractmethod, ABCMeta
+from collections import OrderedDict
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+class FrameCache(metaclass=ABCMeta):
+    """ Frame cache keyed by frame index, bounded by the total bytes of the stored frames.
+
+    Frames can optionally be stored downscaled (scale < 1) or JPEG-compressed (jpeg_quality),
+    they are restored to the original shape when fetched. Fetched frames are always new arrays.
+    """
+
+    def __init__(self, max_bytes: int = 1 << 30, scale: float = 1.0, jpeg_quality: Optional[int] = None):
+        assert 0 < scale <= 1, 'scale should be in (0, 1]!'
+        assert jpeg_quality is None or 0 <= jpeg_quality <= 100, 'jpeg_quality should be in [0, 100]!'
+        self.max_bytes = max_bytes
+        self.scale = scale
+        self.jpeg_quality = jpeg_quality
+        self._store = OrderedDict()  # index -> (payload, original shape)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @abstractmethod
+    def _touch(self, index):
+        # called on every hit
+        pass
+
+    @abstractmethod
+    def _victim(self):
+        # return the index to evict next
+        pass
+
+    def _forget(self, index):
+        pass
+
+    def __contains__(self, index):
+        return index in self._store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, index):
+        frame = self.get(index)
+        if frame is None:
+            raise KeyError(index)
+        return frame
+
+    def __setitem__(self, index, frame: np.ndarray):
+        self.put(index, frame)
+
+    def _encode(self, frame: np.ndarray):
+        payload = frame
+        if self.scale < 1:
+            h, w = frame.shape[:2]
+            size = max(1, int(w * self.scale)), max(1, int(h * self.scale))
+            payload = cv2.resize(payload, size, interpolation=cv2.INTER_AREA)
+        if self.jpeg_quality is not None:
+            _, payload = cv2.imencode('.jpg', payload, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        elif payload is frame:
+            payload = frame.copy()
+        return payload
+
+    def _decode(self, payload: np.ndarray, shape):
+        frame = payload
+        if self.jpeg_quality is not None:
+            frame = cv2.imdecode(payload, cv2.IMREAD_UNCHANGED)
+        if frame.shape[:2] != shape[:2]:
+            frame = cv2.resize(frame, (shape[1], shape[0]), interpolation=cv2.INTER_LINEAR)
+        elif frame is payload:
+            # callers may draw on the frame, the stored one stays intact
+            frame = payload.copy()
+        return frame
+
+    def get(self, index, default=None):
+        entry = self._store.get(index)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._touch(index)
+        return self._decode(*entry)
+
+    def put(self, index, frame: np.ndarray):
+        if frame is None:
+            return self
+        if index in self._store:
+            self.pop(index)
+        payload = self._encode(frame)
+        if payload.nbytes > self.max_bytes:
+            return self
+        while self.nbytes + payload.nbytes > self.max_bytes:
+            self.pop(self._victim())
+            self.evictions += 1
+        self._store[index] = (payload, frame.shape)
+        self.nbytes += payload.nbytes
+        return self
+
+    def pop(self, index):
+        payload, _ = self._store.pop(index)
+        self._forget(index)
+        self.nbytes -= payload.nbytes
+
+    def update(self, frame_dict: dict):
+        for index, frame in frame_dict.items():
+            self.put(index, frame)
+        return self
+
+    def clear(self):
+        for index in list(self._store):
+            self.pop(index)
+        return self
+
+    def stats(self):
+        return {'frames': len(self),
+                'nbytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
+
+
+class LRUFrameCache(FrameCache):
+    def _touch(self, index):
+        self._store.move_to_end(index)
+
+    def _victim(self):
+        return next(iter(self._store))
+
+
+class LFUFrameCache(FrameCache):
+    def __init__(self, max_bytes: int = 1 << 30, scale: float = 1.0, jpeg_quality: Optional[int] = None):
+        super().__init__(max_bytes, scale, jpeg_quality)
+        self._counts = {}
+
+    def _touch(self, index):
+        self._counts[index] += 1
+
+    def _victim(self):
+        # ties are broken by insertion order, the oldest goes first
+        return min(self._store, key=self._counts.__getitem__)
+
+    def _forget(self, index):
+        del self._counts[index]
+
+    def put(self, index, frame: np.ndarray):
+        super().put(index, frame)
+        if index in self._store:
+            self._counts.setdefault(index, 1)
+        return self
@@ -0,0 +1,113 @@
+import multiprocessing as mp
+import sys
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+from zdl.utils.media.image import ImgArray
+
+
+class SharedFrameRing:
+    """ Fixed-size frame slots in shared memory, to pass frames between processes without pickling them.
+
+    Only (index, slot) pairs go through the queues, a slot is written in place by the producer, read in
+    place by a consumer, and recycled by `release`. The producer blocks when every slot is in use.
+
+    Example:
+        >> ring = video.sharedRing(slots=16)
+        >> workers = [Process(target=work, args=(ring,)) for _ in range(4)]
+        >> video.feedRing(ring, consumers=4)
+
+        >> def work(ring):
+        >>     for index, frame in ring.frames():
+        >>         ...  # frame is an ImgArray view, valid until the next iteration
+    """
+
+    def __init__(self, shape: Tuple[int, ...], slots: int = 8, dtype=np.uint8, ctx=None):
+        ctx = ctx or mp.get_context()
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        nbytes = slots * int(np.prod(self.shape)) * self.dtype.itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self._owner = True
+        self._free = ctx.Queue()
+        self._filled = ctx.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+        self._frames = np.ndarray((slots, *self.shape), dtype=self.dtype, buffer=self._shm.buf)
+
+    def __getstate__(self):
+        return {'shape': self.shape, 'dtype': self.dtype, 'slots': self.slots, 'name': self._shm.name,
+                'free': self._free, 'filled': self._filled}
+
+    def __setstate__(self, state):
+        self.shape, self.dtype, self.slots = state['shape'], state['dtype'], state['slots']
+        self._free, self._filled = state['free'], state['filled']
+        if sys.version_info >= (3, 13):
+            self._shm = shared_memory.SharedMemory(name=state['name'], track=False)
+        else:
+            self._shm = shared_memory.SharedMemory(name=state['name'])
+            # only the creator should unlink the block, keep the tracker of this process away from it
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self._shm._name, 'shared_memory')
+        self._owner = False
+        self._frames = np.ndarray((self.slots, *self.shape), dtype=self.dtype, buffer=self._shm.buf)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # producer side
+    def put(self, index: int, frame: np.ndarray, timeout: Optional[float] = None):
+        assert frame.shape == self.shape, f'frame shape {frame.shape} != ring shape {self.shape}!'
+        slot = self._free.get(timeout=timeout)
+        np.copyto(self._frames[slot], frame)
+        self._filled.put((index, slot))
+        return self
+
+    def end(self, consumers: int = 1):
+        # one end mark for every consumer
+        for _ in range(consumers):
+            self._filled.put((None, None))
+        return self
+
+    # consumer side
+    def get(self, timeout: Optional[float] = None) -> Optional[Tuple[int, int, ImgArray]]:
+        """
+        :return: (index, slot, frame view), or None at the end. Call release(slot) when done with the view.
+        """
+        index, slot = self._filled.get(timeout=timeout)
+        if index is None:
+            return None
+        return index, slot, ImgArray(self._frames[slot])
+
+    def release(self, slot: int):
+        self._free.put(slot)
+        return self
+
+    def frames(self):
+        """ Yield (index, frame view) until the end mark, the previous slot is released on each step. """
+        slot = None
+        try:
+            while True:
+                if slot is not None:
+                    self.release(slot)
+                    slot = None
+                got = self.get()
+                if got is None:
+                    return
+                index, slot, frame = got
+                yield index, frame
+        finally:
+            if slot is not None:
+                self.release(slot)
+
+    def close(self):
+        self._frames = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
@@ -4,11 +4,13 @@ import sys
 import tempfile
 import types
 from abc import abstractmethod
+from collections import OrderedDict
 from pathlib import Path
 from statistics import mean
-from typing import Tuple, List, Callable
+from typing import Tuple, List, Callable, Iterable
 
-import PIL
+import PIL.Image
+import PIL.ImageStat
 import cv2
 import matplotlib.pyplot as plt
 import numpy as np
@@ -17,8 +19,13 @@ from scipy.spatial import distance as sci_dist
 
 from zdl.utils.helper.time import timeit
 from zdl.utils.io.log import logger
+from zdl.utils.media.draw import BboxRenderer
 from zdl.utils.media.media import Media, FIGSIZE, IMG_SUFFIXES
 from zdl.utils.media.rect import Rect
+from zdl.utils.media.tiled import TiledImage
+
+
+_default_renderer = None
 
 
 # class ShowType(Enum):
@@ -56,25 +63,81 @@ def sysShow(imagepath_or_obj):
     subprocess.run([image_viewer_command, image_path])
 
 
+def _brightnessLut(factor) -> np.ndarray:
+    # PIL.ImageEnhance.Brightness blends with black in float32 and truncates, reproduced bit for bit.
+    # (256,) table of a factor, (N, 256) tables of N factors
+    factor = np.asarray(factor, dtype=np.float32)[..., np.newaxis]
+    return np.clip(np.arange(256, dtype=np.float32) * factor, 0, 255).astype(np.uint8)
+
+
 class _ImageBase(Media):
     CHANNELS_ORDER = None
+    # default byte budget of every image's derived views cache (gray, HSV, channels, hists), hold=True lifts it
+    DERIVED_CACHE_BYTES = 64 << 20
 
     def __init__(self):
+        self._derived = OrderedDict()
+        self._derived_bytes = 0
+        self.cache_bytes = None
         self._img = None
         self.fname = None
         self.imshow_params = None
         self.title = None
         self.hold = None
         self._info = None
-        self.gray_obj = None
-        self.hist_obj = None
-        self.HSV_obj = None
-        self.B_obj = None
-        self.G_obj = None
-        self.R_obj = None
-        self.H_obj = None
-        self.S_obj = None
-        self.V_obj = None
+
+    @property
+    def _img(self):
+        return self._img_data
+
+    @_img.setter
+    def _img(self, img):
+        self._img_data = img
+        self.invalidate()
+
+    def invalidate(self):
+        """ Drop info and derived views, it's done on every _img assignment, call it after modifying org() in place. """
+        self._info = None
+        self._derived.clear()
+        self._derived_bytes = 0
+        return self
+
+    def setCacheBytes(self, cache_bytes):
+        """ Byte budget of this image's derived views cache, None to follow DERIVED_CACHE_BYTES, 0 to disable. """
+        self.cache_bytes = cache_bytes
+        self._trimDerived(self._cacheLimit())
+        return self
+
+    def _trimDerived(self, limit):
+        while self._derived and self._derived_bytes > limit:
+            _, (_, evicted_bytes) = self._derived.popitem(last=False)
+            self._derived_bytes -= evicted_bytes
+
+    def _cacheLimit(self):
+        if self.hold:
+            return float('inf')
+        return self.DERIVED_CACHE_BYTES if self.cache_bytes is None else self.cache_bytes
+
+    @staticmethod
+    def _nbytes(value):
+        if isinstance(value, _ImageBase):
+            h, w, c = value._shape()
+            return h * w * c
+        return np.asarray(value).nbytes
+
+    def _derive(self, key, factory: Callable):
+        """ Derived view cached by key, least recently used ones are dropped beyond the byte budget. """
+        if key in self._derived:
+            self._derived.move_to_end(key)
+            return self._derived[key][0]
+        value = factory()
+        nbytes = self._nbytes(value)
+        limit = self._cacheLimit()
+        if nbytes <= limit:
+            self._trimDerived(limit - nbytes)
+            self._derived[key] = (value, nbytes)
+            self._derived_bytes += nbytes
+        return value
 
     @abstractmethod
     def _loadImage(self):
@@ -186,28 +249,28 @@ class _ImageBase(Media):
     def brightness(self):
         pass
 
+    def _calcHist(self, hist_size):
+        hists = []
+        if self.isColor():
+            for i in range(len(self.CHANNELS_ORDER)):
+                hists.append(cv2.calcHist([np.asarray(self.org())], [i], None, hist_size, [0, 256]).ravel())
+        hists.append(cv2.calcHist([np.asarray(self.gray().org())], [0], None, hist_size, [0, 256]).ravel())
+        return np.array(hists)
+
     def hist(self, show=True, hist_size=None):
         if hist_size is None:
             hist_size = [256]
         assert 256 % hist_size[0] == 0, 'histSize should be 256 factor!'
         step = int(256 / hist_size[0])
-        hists = []
-        if self.isColor():
-            for i, col in enumerate(self.CHANNELS_ORDER):
-                hist = cv2.calcHist([self.org()], [i], None, hist_size, [0, 256])
-                hist_trans = hist.transpose().ravel()
-                if show:
-                    # pylab.plot(hist,color = col) #256 可以直接显示
-                    pylab.plot(range(int(step / 2), 256, step), hist_trans, color=col)
-                hists.append(hist_trans)
-        hist = cv2.calcHist([self.gray().org()], [0], None, hist_size, [0, 256])
-        hist_trans = hist.transpose().ravel()
-        hists.append(hist_trans)
+        hists = self._derive(('hist', hist_size[0]), lambda: self._calcHist(hist_size)).copy()
         if show:
-            pylab.plot(range(int(step / 2), 256, step), hist_trans, color='grey')
+            colors = (self.CHANNELS_ORDER if self.isColor() else ()) + ('grey',)
+            for hist_trans, col in zip(hists, colors):
+                # pylab.plot(hist,color = col) #256 可以直接显示
+                pylab.plot(range(int(step / 2), 256, step), hist_trans, color=col)
             pylab.xlim([0, 256])
             pylab.show()
-        return pylab.array(hists)
+        return hists
 
     def hist2d(self):
         hist = cv2.calcHist([self.HSV().org()], [0, 1], None, [180, 256], [0, 180, 0, 256])
@@ -217,21 +280,14 @@ class _ImageBase(Media):
 
     def HSV(self):
         assert self.isColor(), 'HSV needs 3 channels image!'
-        if self.HSV_obj is None:
-            if self.imshow_params['cmap'] == 'hsv':
-                logger.warn('Self is already an HSV image!')
-                return self
-            imshow_params = {'cmap': 'hsv'}
-            HSV_obj = self.__class__(cv2.cvtColor(self.org(), cv2.COLOR_BGR2HSV), imshow_params)
-            if self.hold:
-                self.HSV_obj = HSV_obj
-        return self.HSV_obj or HSV_obj
+        if self.imshow_params['cmap'] == 'hsv':
+            logger.warn('Self is already an HSV image!')
+            return self
+        return self._derive('HSV', lambda: self.__class__(cv2.cvtColor(self.org(), cv2.COLOR_BGR2HSV),
+                                                          imshow_params={'cmap': 'hsv'}))
 
     def V(self):
-        V_obj = self.V_obj or self.__class__(self.HSV().org()[..., 2], imshow_params={'cmap': 'Greys_r'})
-        if self.hold:
-            self.V_obj = V_obj
-        return V_obj
+        return self._derive('V', lambda: self.__class__(self.HSV().org()[..., 2], imshow_params={'cmap': 'Greys_r'}))
 
     def diff(self, another):
         logger.info('===============diffing image===============')
@@ -277,9 +333,10 @@ class _ImageBase(Media):
             for c in range(3):
                 d.append(method(hist_self[c].transpose(), hist_another[c].transpose()))
             d = mean(d)
-        full_size = self.gray().org().size
+        h, w, _ = self._shape()
+        full_size = h * w
         ratio = d / full_size
-        logger.debug(d, full_size, ratio)
+        logger.debug(f'{d} {full_size} {ratio}')
         return d, full_size, ratio
 
     def distanceLine(self, another, method=sci_dist.euclidean):
@@ -318,7 +375,7 @@ class _ImageBase(Media):
     def roiCopy(self, rect: Rect):
         rect = rect.toInt()
         roi = self.org()[rect.r_t:rect.r_b, rect.c_l:rect.c_r]
-        return self.__class__(np.copy(roi), self.title)
+        return self.__class__(np.copy(roi), title=self.title)
 
     @abstractmethod
     def enhanceBrightnessTo(self, target_brightness):
@@ -329,12 +386,33 @@ class _ImageBase(Media):
         self._img = func(self.org())
         return self
 
+    def tiled(self, tile_rows=1024) -> TiledImage:
+        # band by band gray/HSV/diff/hist/brightness over the pixels, without full size temporaries
+        return TiledImage(np.asarray(self.org()), tile_rows, rgb=self.CHANNELS_ORDER[0] == 'r')
+
 
 class ImageCV(_ImageBase):
     CHANNELS_ORDER = ('b', 'g', 'r')
-
-    def __init__(self, media, title=None, imshow_params=None, hold=False):
+    _READ_FLAGS = {(1, False): cv2.IMREAD_COLOR,
+                   (2, False): cv2.IMREAD_REDUCED_COLOR_2,
+                   (4, False): cv2.IMREAD_REDUCED_COLOR_4,
+                   (8, False): cv2.IMREAD_REDUCED_COLOR_8,
+                   (1, True): cv2.IMREAD_GRAYSCALE,
+                   (2, True): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+                   (4, True): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+                   (8, True): cv2.IMREAD_REDUCED_GRAYSCALE_8}
+
+    def __init__(self, media, title=None, imshow_params=None, hold=False, reduce=1, gray=False):
+        """
+        :param reduce: 1/2/4/8, file images are decoded at 1/reduce size, JPEG decodes them directly that small.
+        :param gray: file images are decoded as single channel.
+        """
         super().__init__()
+        assert (reduce, gray) in self._READ_FLAGS, 'reduce should be in [1, 2, 4, 8]!'
+        self._read_flag = self._READ_FLAGS[(reduce, gray)]
+        self._reduce = reduce
+        self._read_gray = gray
+        self._header_shape = None
         if imshow_params is None:
             imshow_params = {}
         if isinstance(media, np.ndarray):
@@ -353,10 +431,30 @@ class ImageCV(_ImageBase):
         self.hold = hold
 
     def _loadImage(self):
-        self._img = ImgArray(cv2.imread(self.fname))
+        self._img = ImgArray(cv2.imread(self.fname, self._read_flag))
+
+    def _probeShape(self):
+        # from the file header only, the same as the decoded shape
+        if self._header_shape is None:
+            with PIL.Image.open(self.fname) as header:
+                w, h = header.size
+                # imread applies the EXIF orientation
+                if header.getexif().get(0x0112) in (5, 6, 7, 8):
+                    w, h = h, w
+                if self._reduce > 1:
+                    # libjpeg scales while decoding and rounds up, the others are resized and rounded down
+                    if header.format == 'JPEG':
+                        w, h = -(-w // self._reduce), -(-h // self._reduce)
+                    else:
+                        w, h = w // self._reduce, h // self._reduce
+            self._header_shape = (h, w) if self._read_gray else (h, w, 3)
+        return self._header_shape
 
     def _shape(self):
-        shape = self.org().shape
+        if self._img is None and self.fname is not None:
+            shape = self._probeShape()
+        else:
+            shape = self.org().shape
         if len(shape) == 2:
             h, w = shape
             c = 1
@@ -378,37 +476,24 @@ class ImageCV(_ImageBase):
         return self._info
 
     def gray(self):
-        if self.gray_obj is None:
-            imshow_params = {'cmap': 'Greys_r'}
-            if self.isColor():
-                gray_obj = self.__class__(cv2.cvtColor(self.org(), cv2.COLOR_BGR2GRAY), imshow_params)
-            else:
-                # assert False, 'It is already a single channel!'
-                gray_obj = self.__class__(self.org(), imshow_params)
-            if self.hold:
-                self.gray_obj = gray_obj
-        return self.gray_obj or gray_obj
+        imshow_params = {'cmap': 'Greys_r'}
+        if not self.isColor():
+            # assert False, 'It is already a single channel!'
+            return self.__class__(self.org(), imshow_params)
+        return self._derive('gray', lambda: self.__class__(cv2.cvtColor(self.org(), cv2.COLOR_BGR2GRAY),
+                                                           imshow_params))
 
     def B(self):
         assert self.isColor(), 'It is already a single channel!'
-        B_obj = self.B_obj or self.__class__(cv2.split(self.org())[0], imshow_params={'cmap': 'Blues_r'})
-        if self.hold:
-            self.B_obj = B_obj
-        return B_obj
+        return self._derive('B', lambda: self.__class__(cv2.split(self.org())[0], imshow_params={'cmap': 'Blues_r'}))
 
     def G(self):
         assert self.isColor(), 'It is already a single channel!'
-        G_obj = self.G_obj or self.__class__(self.org()[..., 1], imshow_params={'cmap': 'Greens_r'})
-        if self.hold:
-            self.G_obj = G_obj
-        return G_obj
+        return self._derive('G', lambda: self.__class__(self.org()[..., 1], imshow_params={'cmap': 'Greens_r'}))
 
     def R(self):
         assert self.isColor(), 'It is already a single channel!'
-        R_obj = self.R_obj or self.__class__(self.org()[..., 2], imshow_params={'cmap': 'Reds_r'})
-        if self.hold:
-            self.R_obj = R_obj
-        return R_obj
+        return self._derive('R', lambda: self.__class__(self.org()[..., 2], imshow_params={'cmap': 'Reds_r'}))
 
     def brightness(self):
         return self.gray().org().mean()
@@ -416,53 +501,46 @@ class ImageCV(_ImageBase):
     @timeit
     def enhanceBrightnessTo(self, target_brightness):
         org_brightness = self.brightness()
-        img = PIL.Image.fromarray(self.org())
-        factor = target_brightness / self.brightness() + 0.1
-        enhancer = PIL.ImageEnhance.Brightness(img)
-        enhanced_img = enhancer.enhance(factor)
-        self._img = ImgArray(np.asarray(enhanced_img))
+        factor = target_brightness / org_brightness + 0.1
+        lut = _brightnessLut(factor)
+        if self.org().ndim == 3 and self.org().shape[2] == 4:
+            # alpha is left as is, like ImageEnhance.Brightness
+            lut = np.stack([lut, lut, lut, np.arange(256, dtype=np.uint8)], axis=-1)[np.newaxis]
+        self._img = ImgArray(cv2.LUT(self.org(), lut))
         logger.debug(f'original brightness is {org_brightness}')
         logger.debug(f'enhanced brightness is {self.brightness()}')
         return self
 
-    def drawBboxes(self, bbox_entities: List[Tuple[Rect, str]], copy=True):
+    def toPIL(self) -> 'ImagePIL':
+        """ Color pixels are unpacked from BGR(A) straight into PIL's storage in one copy, gray ones are shared. """
+        img = self.org()
+        if img.ndim == 3 and img.shape[2] == 1:
+            img = img[..., 0]
+        if img.ndim == 2:
+            return ImagePIL(PIL.Image.fromarray(np.asarray(img)), title=self.title)
+        mode, raw_mode = ('RGBA', 'BGRA') if img.shape[2] == 4 else ('RGB', 'BGR')
+        h, w = img.shape[:2]
+        pil = PIL.Image.frombuffer(mode, (w, h), np.ascontiguousarray(img), 'raw', raw_mode, 0, 1)
+        return ImagePIL(pil, title=self.title)
+
+    def drawBboxes(self, bbox_entities: List[Tuple[Rect, str]], copy=True, renderer: BboxRenderer = None):
         """
-        bbox_entities: List[Tuple[rect, label]]
+        bbox_entities: List[Tuple[rect, label]] or List[Tuple[rect, label, color_key]]
+        renderer: default is a shared BboxRenderer, its label sprites are reused across calls.
         """
-        # Log.debug(bbox_entities)
-        img = self.org().copy() if copy else self.org()
-        for i, bbox_entity in enumerate(bbox_entities):
-            bbox, label = bbox_entity
-            logger.info(label)
-            # color = tuple(np.random.randint(256, size=3))
-            xywh = tuple(bbox.toInt().xywh)
-            color = tuple(np.random.choice(range(40, 256), size=3))
-            color_int = tuple(map(int, color))[::-1]
-            label_w = len(label) * 12
-            label_h = 25
-            thickness = 3
-            cv2.rectangle(img, rec=xywh, color=color_int, thickness=thickness)
-            cv2.rectangle(img,
-                          rec=(
-                              xywh[0] - thickness // 2 - 1,
-                              max(0, xywh[1] - label_h),
-                              label_w,
-                              label_h,
-                          ),
-                          color=color_int, thickness=-1)
-            cv2.putText(img, label, org=(xywh[0], max(22, xywh[1] - 5)),
-                        fontFace=cv2.FONT_HERSHEY_TRIPLEX,
-                        fontScale=0.6,
-                        color=(0, 0, 0),
-                        lineType=cv2.LINE_AA)
-        return self.__class__(img, f'{self.title}:draw_bboxes') if copy else self
+        global _default_renderer
+        if renderer is None:
+            renderer = _default_renderer = _default_renderer or BboxRenderer()
+        logger.debug([entity[1] for entity in bbox_entities])
+        img = renderer.draw(self.org(), bbox_entities, copy=copy)
+        return self.__class__(img, f'{self.title}:draw_bboxes') if copy else self.invalidate()
 
     def drawPoints(self, points, copy=True):
         img = self.org().copy() if copy else self.org()
         for p in points:
             cv2.circle(img, p, radius=10, color=(0, 0, 0), thickness=-1)
             cv2.circle(img, p, radius=10, color=(255, 255, 255), thickness=2)
-        return self.__class__(img, f'{self.title}:draw_points') if copy else self
+        return self.__class__(img, f'{self.title}:draw_points') if copy else self.invalidate()
 
 
 class ImagePIL(_ImageBase):
@@ -509,48 +587,209 @@ class ImagePIL(_ImageBase):
         return self._info
 
     def gray(self):
-        if self.gray_obj is None:
-            imshow_params = {'cmap': 'Greys_r'}
-            if self.isColor():
-                gray_obj = self.__class__(self.org().convert('L'), imshow_params)
-            else:
-                # assert False, 'It is already a single channel!'
-                gray_obj = self.__class__(self.org(), imshow_params)
-            if self.hold:
-                self.gray_obj = gray_obj
-        return self.gray_obj or gray_obj
+        imshow_params = {'cmap': 'Greys_r'}
+        if not self.isColor():
+            # assert False, 'It is already a single channel!'
+            return self.__class__(self.org(), imshow_params)
+        return self._derive('gray', lambda: self.__class__(self.org().convert('L'), imshow_params))
 
     def B(self):
         assert self.isColor(), 'It is already a single channel!'
-        B_obj = self.B_obj or self.__class__(self.org().split()[2], imshow_params={'cmap': 'Blues_r'})
-        if self.hold:
-            self.B_obj = B_obj
-        return B_obj
+        return self._derive('B', lambda: self.__class__(self.org().split()[2], imshow_params={'cmap': 'Blues_r'}))
 
     def G(self):
         assert self.isColor(), 'It is already a single channel!'
-        G_obj = self.G_obj or self.__class__(self.org().split()[1], imshow_params={'cmap': 'Greens_r'})
-        if self.hold:
-            self.G_obj = G_obj
-        return G_obj
+        return self._derive('G', lambda: self.__class__(self.org().split()[1], imshow_params={'cmap': 'Greens_r'}))
 
     def R(self):
         assert self.isColor(), 'It is already a single channel!'
-        R_obj = self.R_obj or self.__class__(self.org().split()[0], imshow_params={'cmap': 'Reds_r'})
-        if self.hold:
-            self.R_obj = R_obj
-        return R_obj
+        return self._derive('R', lambda: self.__class__(self.org().split()[0], imshow_params={'cmap': 'Reds_r'}))
 
     def brightness(self):
-        return np.asarray(self.gray().org()).mean()
+        # the mean of convert('L') from the band means, without building the gray image
+        means = PIL.ImageStat.Stat(self.org()).mean
+        if self.isColor():
+            return (means[0] * 299 + means[1] * 587 + means[2] * 114) / 1000
+        return means[0]
 
     @timeit
     def enhanceBrightnessTo(self, target_brightness):
         org_brightness = self.brightness()
         factor = target_brightness / org_brightness + 0.1
-        enhancer = PIL.ImageEnhance.Brightness(self.org())
-        enhanced_img = enhancer.enhance(factor)
-        self._img = enhanced_img
+        lut, identity = _brightnessLut(factor).tolist(), list(range(256))
+        # alpha is left as is, like ImageEnhance.Brightness
+        self._img = self.org().point([v for band in self.org().getbands() for v in (identity if band == 'A' else lut)])
         logger.debug(f'original brightness is {org_brightness}')
         logger.debug(f'enhanced brightness is {self.brightness()}')
         return self
+
+    def toCV(self) -> ImageCV:
+        """ Packed straight into BGR(A) order by PIL, then copied once into a writable buffer for drawing. """
+        img = self.org()
+        if img.mode not in ('L', 'RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+        raw_mode = {'L': 'L', 'RGB': 'BGR', 'RGBA': 'BGRA'}[img.mode]
+        w, h = img.size
+        shape = (h, w) if img.mode == 'L' else (h, w, len(raw_mode))
+        pixels = np.frombuffer(bytearray(img.tobytes('raw', raw_mode)), dtype=np.uint8).reshape(shape)
+        return ImageCV(pixels, title=self.title)
+
+
+class ImageStack(Media):
+    """ N images of the same shape in one (N, H, W[, C]) ImgArray, channels ordered like ImageCV.
+
+    Methods mirror those of _ImageBase, vectorized over the first axis, and return one result per image.
+    Large temporaries are built `chunk` images at a time.
+
+    Example:
+        >> stack = ImageStack.fromVideo(video, stride=10, size=(-1, 240))
+        >> stack.brightness()  # (N,) array
+    """
+    CHANNELS_ORDER = ('b', 'g', 'r')
+
+    def __init__(self, images, indices=None, title=None, chunk=64):
+        """
+        :param images: (N, H, W[, C]) array, or an iterable of arrays / ImageCV of the same shape.
+        :param indices: one label per image, e.g. frame indices, default is range(N).
+        """
+        super().__init__()
+        if not isinstance(images, np.ndarray):
+            images = np.stack([i.org() if isinstance(i, ImageCV) else i for i in images])
+        assert images.ndim in (3, 4), f'images should be (N, H, W[, C]), got {images.shape}!'
+        self._imgs = ImgArray(images)
+        self.indices = np.arange(len(images)) if indices is None else np.asarray(indices)
+        assert len(self.indices) == len(images), 'indices length should equal images number!'
+        self.title = title
+        self.chunk = chunk
+        self._info = None
+
+    @classmethod
+    def fromFrames(cls, frames: Iterable[Tuple[int, np.ndarray]], title=None) -> 'ImageStack':
+        """ From (index, frame) pairs, e.g. Video.readDict output. """
+        indices, images = zip(*frames)
+        return cls(np.stack(images), indices, title)
+
+    @classmethod
+    def fromVideo(cls, video, indices=None, **read_params) -> 'ImageStack':
+        """ Read frames straight into a preallocated stack.
+        :param read_params: passed to video.readDict, e.g. stride, size, gray, prefetch.
+        """
+        indices = video._normIndices(indices)[::read_params.get('stride', 1)]
+        shape = video.frameShape(read_params.get('size'), read_params.get('gray', False))
+        images = np.empty((len(indices), *shape), dtype=np.uint8)
+        got = []
+        for n, (i, frame) in enumerate(video.readDict(indices, **dict(read_params, stride=1))):
+            images[n] = frame
+            got.append(i)
+        return cls(images[:len(got)], got, video.fname)
+
+    def __len__(self):
+        return len(self._imgs)
+
+    def __getitem__(self, n) -> ImageCV:
+        return ImageCV(self._imgs[n], title=self.indices[n])
+
+    def __iter__(self):
+        return (self[n] for n in range(len(self)))
+
+    def _chunks(self):
+        for s in range(0, len(self), self.chunk):
+            yield slice(s, s + self.chunk)
+
+    def org(self) -> ImgArray:
+        return self._imgs
+
+    def isColor(self):
+        return self._imgs.ndim == 4 and self._imgs.shape[-1] == 3
+
+    def getInfo(self):
+        if self._info is None:
+            n, h, w = self._imgs.shape[:3]
+            c = self._imgs.shape[3] if self._imgs.ndim == 4 else 1
+            self._info = {'fname': self.title,
+                          'frame_c': n,
+                          'shape': (h, w, c),
+                          'width': w,
+                          'height': h,
+                          'channels': c,
+                          'mode': 'cv2'}
+        return self._info
+
+    def show(self, n=0, **params):
+        self[n].show(**params)
+        return self
+
+    def gray(self) -> 'ImageStack':
+        if not self.isColor():
+            return self
+        n, h, w, c = self._imgs.shape
+        # one cvtColor call, the stack is seen as a single (N*H, W) tall image
+        gray = cv2.cvtColor(np.ascontiguousarray(self._imgs).reshape(n * h, w, c), cv2.COLOR_BGR2GRAY)
+        return self.__class__(gray.reshape(n, h, w), self.indices, self.title, self.chunk)
+
+    def brightness(self) -> np.ndarray:
+        gray = self.gray().org()
+        return gray.reshape(len(gray), -1).mean(axis=1)
+
+    def _bincount(self, channel_imgs: np.ndarray, bins: int) -> np.ndarray:
+        # (n, ...) uint8 -> (n, bins), one bincount for the whole chunk
+        n = len(channel_imgs)
+        idx = channel_imgs.reshape(n, -1) // (256 // bins)
+        idx = idx.astype(np.intp) + (np.arange(n, dtype=np.intp) * bins)[:, None]
+        return np.bincount(idx.ravel(), minlength=n * bins).reshape(n, bins)
+
+    def hist(self, hist_size=None) -> np.ndarray:
+        """
+        :return: (N, 4, bins) for color images - channels then gray, like _ImageBase.hist; (N, 1, bins) for gray.
+        """
+        if hist_size is None:
+            hist_size = [256]
+        bins = hist_size[0]
+        assert 256 % bins == 0, 'histSize should be 256 factor!'
+        color = self.isColor()
+        hists = np.empty((len(self), 4 if color else 1, bins), dtype=np.float32)
+        gray = self.gray().org()
+        for s in self._chunks():
+            if color:
+                for c in range(3):
+                    hists[s, c] = self._bincount(self._imgs[s, ..., c], bins)
+            hists[s, -1] = self._bincount(gray[s], bins)
+        return hists
+
+    def diff(self, another) -> 'ImageStack':
+        """
+        :param another: an ImageStack / array of the same shape, or a single image compared with every one.
+        """
+        if isinstance(another, (ImageStack, ImageCV)):
+            another = another.org()
+        another = np.asarray(another)
+        assert another.shape in (self._imgs.shape, self._imgs.shape[1:]), 'The shapes should be the same!'
+        # max - min is the absolute difference without leaving uint8
+        diff_ = np.maximum(self._imgs, another) - np.minimum(self._imgs, another)
+        return self.__class__(diff_, self.indices, self.title, self.chunk)
+
+    def roiCopy(self, rect: Rect) -> 'ImageStack':
+        rect = rect.toInt()
+        roi = self._imgs[:, rect.r_t:rect.r_b, rect.c_l:rect.c_r]
+        return self.__class__(np.copy(roi), self.indices, self.title, self.chunk)
+
+    def enhanceBrightnessTo(self, target_brightness) -> 'ImageStack':
+        """ Every image is scaled by its own factor, the same as ImageCV.enhanceBrightnessTo.
+
+        The result replaces the pixels of the stack, the wrapped array is left untouched.
+        """
+        luts = _brightnessLut(target_brightness / self.brightness() + 0.1)  # (N, 256)
+        out = np.empty(self._imgs.shape, dtype=np.uint8)
+        # alpha is left as is, like ImageEnhance.Brightness
+        alpha = self._imgs.ndim == 4 and self._imgs.shape[3] == 4
+        for s in self._chunks():
+            imgs = self._imgs[s, ..., :3] if alpha else self._imgs[s]
+            rows = np.arange(len(luts))[s].reshape(-1, *(1,) * (imgs.ndim - 1))
+            # one lookup per chunk, the table of every pixel picked by its image row
+            if alpha:
+                out[s, ..., :3] = luts[rows, imgs]
+                out[s, ..., 3] = self._imgs[s, ..., 3]
+            else:
+                out[s] = luts[rows, imgs]
+        self._imgs = ImgArray(out)
+        return self
@@ -0,0 +1,285 @@
+"""Perceptual hashes of images and video frames, and a Hamming distance index over them.
+
+Example:
+    >> from zdl.utils.media.phash import pHash, hashVideo, HammingIndex
+    >> indices, hashes = hashVideo(video, stride=5)
+    >> index = HammingIndex().add(hashes, indices)
+    >> index.query(hashes[0], radius=6)  # (ids, distances) of near duplicates
+    >> labels = index.cluster(radius=6)
+"""
+from itertools import combinations
+from typing import Callable, Tuple, Optional
+
+import cv2
+import numpy as np
+
+from zdl.utils.media.image import ImageCV, ImageStack
+
+_DCT_32 = None
+
+
+def _grayStack(images, size: Tuple[int, int]) -> np.ndarray:
+    """ -> (N, h, w) float32.
+
+    :param images: an ImageStack, an ImageCV, an (N, H, W[, C]) batch array, an (H, W) gray array, or a list
+        of arrays / ImageCV. A 3 dims array is always a gray batch, pass a single color image as ImageCV.
+    """
+    if isinstance(images, ImageStack):
+        images = images.org()
+    elif isinstance(images, ImageCV) or isinstance(images, np.ndarray) and images.ndim == 2:
+        images = [images]
+    out = np.empty((len(images), size[1], size[0]), dtype=np.float32)
+    for n, img in enumerate(images):
+        img = img.org() if isinstance(img, ImageCV) else np.asarray(img)
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY if img.shape[-1] == 3 else cv2.COLOR_BGRA2GRAY)
+        out[n] = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+    return out
+
+
+def _packBits(bits: np.ndarray) -> np.ndarray:
+    # (N, 64) bool -> (N,) uint64, first bit is the most significant
+    return np.packbits(bits, axis=1).view('>u8').ravel().astype(np.uint64)
+
+
+def aHash(images) -> np.ndarray:
+    pixels = _grayStack(images, (8, 8)).reshape(-1, 64)
+    return _packBits(pixels > pixels.mean(axis=1, keepdims=True))
+
+
+def dHash(images) -> np.ndarray:
+    pixels = _grayStack(images, (9, 8))
+    return _packBits((pixels[:, :, 1:] > pixels[:, :, :-1]).reshape(-1, 64))
+
+
+def pHash(images) -> np.ndarray:
+    global _DCT_32
+    if _DCT_32 is None:
+        k = np.arange(32)
+        _DCT_32 = (np.sqrt(2 / 32) * np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / 64)).astype(np.float32)
+        _DCT_32[0] /= np.sqrt(2)
+    # batched 2D DCT: D @ X @ D.T for every image at once
+    coeffs = np.matmul(np.matmul(_DCT_32, _grayStack(images, (32, 32))), _DCT_32.T)
+    low = coeffs[:, :8, :8].reshape(-1, 64)
+    median = np.median(low[:, 1:], axis=1, keepdims=True)  # DC term excluded
+    return _packBits(low > median)
+
+
+def hashVideo(video, method: Callable = pHash, indices=None, batch_size=256, **read_params):
+    """
+    :param read_params: passed to video.readDict, e.g. stride, size, prefetch. gray defaults to True.
+    :return: (frame indices, hashes) arrays
+    """
+    read_params.setdefault('gray', True)
+    got_indices, hashes, batch = [], [], []
+    for i, frame in video.readDict(indices, **read_params):
+        got_indices.append(i)
+        batch.append(frame)
+        if len(batch) == batch_size:
+            hashes.append(method(batch))
+            batch = []
+    if batch:
+        hashes.append(method(batch))
+    return np.asarray(got_indices), np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64)
+
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(x: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(np.asarray(x, dtype=np.uint64)).astype(np.int64)
+else:
+    _POPCOUNT_8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+    def popcount(x: np.ndarray) -> np.ndarray:
+        x = np.ascontiguousarray(x, dtype=np.uint64)
+        return _POPCOUNT_8[x.view(np.uint8).reshape(*x.shape, 8)].sum(axis=-1)
+
+
+def hamming(a, b) -> np.ndarray:
+    return popcount(np.bitwise_xor(np.asarray(a, dtype=np.uint64), np.asarray(b, dtype=np.uint64)))
+
+
+_FLIP_MASKS = {}
+
+
+def _flipMasks(bits: int, radius: int) -> np.ndarray:
+    # xor masks of every flip of at most radius bits out of bits, built once per (bits, radius)
+    if (bits, radius) not in _FLIP_MASKS:
+        masks = [sum(1 << b for b in flips) for r in range(radius + 1) for flips in combinations(range(bits), r)]
+        _FLIP_MASKS[(bits, radius)] = np.asarray(masks, dtype=np.uint64)
+    return _FLIP_MASKS[(bits, radius)]
+
+
+class HammingIndex:
+    """ Multi-index hashing over 64 bits hashes.
+
+    Hashes are split into `chunks` substrings, each one has a sorted table. A hash within distance r of the
+    query agrees with it on at least one substring within distance r // chunks, so only those buckets are
+    looked up and verified.
+
+    Added hashes are scanned directly until they outnumber max(MERGE_MIN, 1/8 of the indexed ones), then
+    merged into the tables in O(N), so a query-then-add loop costs amortized O(1) table work per hash and a
+    query scans at most that tail besides its buckets.
+    """
+    MERGE_MIN = 1024
+    PAIRS_BLOCK = 1 << 22
+
+    def __init__(self, chunks=4):
+        assert 64 % chunks == 0, 'chunks should be a 64 factor!'
+        self.chunks = chunks
+        self.bits = 64 // chunks
+        self._n = 0
+        self._hashes_buf = np.empty(0, dtype=np.uint64)
+        self._ids_buf = np.empty(0, dtype=np.int64)
+        # (sorted substrings, positions) per chunk, covering positions < _indexed
+        self._tables = [(np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.intp)) for _ in range(chunks)]
+        self._indexed = 0
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def _hashes(self) -> np.ndarray:
+        return self._hashes_buf[:self._n]
+
+    @property
+    def _ids(self) -> np.ndarray:
+        return self._ids_buf[:self._n]
+
+    def add(self, hashes, ids=None) -> 'HammingIndex':
+        hashes = np.atleast_1d(np.asarray(hashes, dtype=np.uint64))
+        ids = np.arange(self._n, self._n + len(hashes)) if ids is None else np.atleast_1d(np.asarray(ids))
+        assert len(ids) == len(hashes), 'ids length should equal hashes number!'
+        end = self._n + len(hashes)
+        ids_dtype = ids.dtype if self._n == 0 else np.result_type(self._ids_buf, ids)
+        if end > len(self._hashes_buf) or ids_dtype != self._ids_buf.dtype:
+            # doubling buffers, appending is amortized O(1)
+            capacity = max(end, 2 * len(self._hashes_buf), 64)
+            hashes_buf, ids_buf = np.empty(capacity, dtype=np.uint64), np.empty(capacity, dtype=ids_dtype)
+            hashes_buf[:self._n], ids_buf[:self._n] = self._hashes, self._ids
+            self._hashes_buf, self._ids_buf = hashes_buf, ids_buf
+        self._hashes_buf[self._n:end], self._ids_buf[self._n:end] = hashes, ids
+        self._n = end
+        if self._n - self._indexed > max(self.MERGE_MIN, self._indexed // 8):
+            self._merge()
+        return self
+
+    def _substrings(self, hashes: np.ndarray, c: int) -> np.ndarray:
+        mask = np.uint64((1 << self.bits) - 1)
+        return (hashes >> np.uint64(c * self.bits)) & mask
+
+    def _merge(self):
+        # sorted merge of the unindexed tail into every table, no re-sort of the indexed part
+        positions = np.arange(self._indexed, self._n)
+        hashes = self._hashes[positions]
+        for c, (keys, order) in enumerate(self._tables):
+            new_keys = self._substrings(hashes, c)
+            sort = np.argsort(new_keys, kind='stable')
+            new_keys, new_positions = new_keys[sort], positions[sort]
+            at = np.searchsorted(keys, new_keys, 'right')
+            self._tables[c] = (np.insert(keys, at, new_keys), np.insert(order, at, new_positions))
+        self._indexed = self._n
+
+    def _candidates(self, h: np.uint64, radius: int) -> np.ndarray:
+        masks = _flipMasks(self.bits, radius // self.chunks)
+        # the unindexed tail is verified directly
+        found = [np.arange(self._indexed, self._n)]
+        for c, (keys, order) in enumerate(self._tables):
+            variants = self._substrings(h, c) ^ masks
+            lo, hi = np.searchsorted(keys, variants, 'left'), np.searchsorted(keys, variants, 'right')
+            found.extend(order[l:r] for l, r in zip(lo, hi) if l < r)
+        return np.unique(np.concatenate(found))
+
+    def query(self, h, radius=6, positions=False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: (ids, distances) of the hashes within radius, nearest first;
+                 positions instead of ids if `positions`.
+        """
+        h = np.uint64(h)
+        candidates = self._candidates(h, radius)
+        distances = hamming(self._hashes[candidates], h)
+        keep = distances <= radius
+        candidates, distances = candidates[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        found = candidates[order] if positions else self._ids[candidates[order]]
+        return found, distances[order]
+
+    def pairs(self, radius=6) -> np.ndarray:
+        """ (M, 2) positions of all pairs within radius, i < j, sorted.
+
+        Every substring table is self-joined: each key is matched with the runs of its variants within
+        radius // chunks, the candidate pairs are expanded and verified in blocks of PAIRS_BLOCK.
+        """
+        if self._indexed < self._n:
+            self._merge()
+        n, hashes = self._n, self._hashes
+        masks = _flipMasks(self.bits, radius // self.chunks)
+        found = []
+        for keys, order in self._tables:
+            # hashes in table order, a run of equal keys is contiguous
+            table_hashes = hashes[order]
+            # run start of every possible key, short substrings only, else binary searches
+            runs = None
+            if self.bits <= 20:
+                runs = np.append(np.searchsorted(keys, np.arange(1 << self.bits, dtype=np.uint64)), n)
+            for mask in masks:
+                variants = keys ^ mask
+                if runs is None:
+                    lo, hi = np.searchsorted(keys, variants, 'left'), np.searchsorted(keys, variants, 'right')
+                else:
+                    lo, hi = runs[variants.astype(np.intp)], runs[variants.astype(np.intp) + 1]
+                if mask == 0:
+                    # the run of the key itself, later entries only
+                    lo = np.arange(1, n + 1)
+                else:
+                    # the pair also shows up from the variant's side, keep the side with the smaller key
+                    hi = np.where(variants > keys, hi, lo)
+                ends = np.cumsum(hi - lo)
+                bounds = np.searchsorted(ends, np.arange(self.PAIRS_BLOCK, ends[-1] if n else 0, self.PAIRS_BLOCK))
+                for start, stop in zip(np.r_[0, bounds], np.r_[bounds, n]):
+                    i, j = _expandRanges(lo[start:stop], hi[start:stop])
+                    i += start
+                    keep = popcount(table_hashes[i] ^ table_hashes[j]) <= radius
+                    a, b = order[i[keep]], order[j[keep]]
+                    found.append(np.minimum(a, b).astype(np.int64) * n + np.maximum(a, b))
+        codes = np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+        return np.stack([codes // n, codes % n], axis=1).astype(np.intp)
+
+    def cluster(self, radius=6, pairs: Optional[np.ndarray] = None) -> np.ndarray:
+        """ Connected components of the near duplicate graph, one label per added hash.
+
+        A label is the smallest position of its component.
+        """
+        pairs = self.pairs(radius) if pairs is None else np.asarray(pairs).reshape(-1, 2)
+        return _components(len(self), pairs)
+
+
+def _expandRanges(lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # (i, j) for every j in [lo[i], hi[i]), without a python loop
+    counts = hi - lo
+    i = np.repeat(np.arange(len(lo)), counts)
+    j = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - lo, counts)
+    return i, j
+
+
+def _components(n: int, pairs: np.ndarray) -> np.ndarray:
+    try:
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+    except ImportError:
+        # label propagation with pointer jumping, every label ends as the smallest node of its component
+        labels = np.arange(n)
+        a, b = pairs[:, 0], pairs[:, 1]
+        while True:
+            low = np.minimum(labels[a], labels[b])
+            new = labels.copy()
+            np.minimum.at(new, a, low)
+            np.minimum.at(new, b, low)
+            new = new[new]
+            if np.array_equal(new, labels):
+                return labels
+            labels = new
+    graph = coo_matrix((np.ones(len(pairs), dtype=np.int8), (pairs[:, 0], pairs[:, 1])), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    # components are numbered in order of their smallest node
+    _, first = np.unique(labels, return_index=True)
+    return first[labels]
@@ -26,7 +26,7 @@ class Point:
 
     @classmethod
     def pointsCenter(cls, points, need_type=None):
-        if points == []:
+        if len(points) == 0:
             return []
         # ndim 2 to 3
         # points_array.shape = (1,)+points_array.shape
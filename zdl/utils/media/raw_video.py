@@ -0,0 +1,128 @@
+import os
+import struct
+from typing import Union, Tuple, List
+
+import numpy as np
+
+from zdl.utils.io.log import logger
+from zdl.utils.media.frame_cache import FrameCache, LRUFrameCache
+from zdl.utils.media.video import Video, _convertFrame
+
+MAGIC = b'ZDLRAW01'
+# magic, frame_c, height, width, channels, fps
+_HEADER = struct.Struct('<8sqqqqd')
+HEADER_SIZE = 64
+
+
+def _readHeader(path):
+    with open(path, 'rb') as f:
+        magic, frame_c, height, width, channels, fps = _HEADER.unpack(f.read(_HEADER.size))
+    assert magic == MAGIC, f'{path} is not a raw video file!'
+    shape = (frame_c, height, width) if channels == 1 else (frame_c, height, width, channels)
+    return shape, fps
+
+
+def _writeHeader(f, shape, fps):
+    frame_c, height, width = shape[:3]
+    channels = shape[3] if len(shape) == 4 else 1
+    f.seek(0)
+    f.write(_HEADER.pack(MAGIC, frame_c, height, width, channels, fps).ljust(HEADER_SIZE, b'\0'))
+
+
+def exportRaw(video: Video, path, indices: Union[range, Tuple, List] = None, flush_every=64, **read_params):
+    """ Decode `video` once into a raw uint8 file: a 64 bytes header then frames x H x W (x C).
+
+    Frames are streamed into a memory map, so at most `flush_every` frames are dirty at a time.
+    The exported frames are renumbered from 0.
+    :param read_params: passed to video.readDict, e.g. stride, size, gray, prefetch.
+    """
+    stride = read_params.get('stride', 1)
+    frame_c = len(video._normIndices(indices)[::stride])
+    shape = (frame_c, *video.frameShape(read_params.get('size'), read_params.get('gray', False)))
+    fps = video.getInfo()['fps'] / stride
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        _writeHeader(f, shape, fps)
+        f.truncate(HEADER_SIZE + int(np.prod(shape)))
+    frames = np.memmap(tmp, dtype=np.uint8, mode='r+', offset=HEADER_SIZE, shape=shape)
+    written = 0
+    for i, frame in video.readDict(indices, **read_params):
+        if frame is None:
+            logger.warning(f'frame {i} decode failed, export stops at {written} frames!')
+            break
+        frames[written] = frame
+        written += 1
+        if written % flush_every == 0:
+            frames.flush()
+    frames.flush()
+    del frames
+    if written != frame_c:
+        shape = (written, *shape[1:])
+        with open(tmp, 'r+b') as f:
+            _writeHeader(f, shape, fps)
+            f.truncate(HEADER_SIZE + int(np.prod(shape)))
+    os.replace(tmp, path)
+    return RawVideo(path)
+
+
+class RawVideo(Video):
+    """ Video served from a raw file written by exportRaw, random access costs no decoding.
+
+    The file is memory mapped read-only, so several processes can read it concurrently and share the page cache.
+    """
+    SUFFIXES = None
+
+    def __init__(self, fname, frame_cache: FrameCache = None):
+        """
+        :param frame_cache: default caches nothing, reading the map is as cheap.
+        """
+        super().__init__(fname, seek_window=0, frame_cache=LRUFrameCache(0) if frame_cache is None else frame_cache,
+                         info_cache=False)
+        shape, self._fps = _readHeader(fname)
+        self._frames = np.memmap(fname, dtype=np.uint8, mode='r', offset=HEADER_SIZE, shape=shape) \
+            if shape[0] else np.empty(shape, dtype=np.uint8)
+
+    def __getstate__(self):
+        # reopen the map in the receiving process instead of pickling the frames
+        return {'fname': self.fname}
+
+    def __setstate__(self, state):
+        self.__init__(state['fname'])
+
+    def getInfo(self):
+        if self._info is None:
+            frame_c = self._frames.shape[0]
+            shape = self._frames.shape[1:] if self._frames.ndim == 4 else (*self._frames.shape[1:], 1)
+            self._info = {'fname': self.fname,
+                          'frame_c': frame_c,
+                          'duration': frame_c / self._fps if self._fps else None,
+                          'shape': shape,
+                          'width': shape[1],
+                          'height': shape[0],
+                          'channels': shape[2],
+                          'fps': self._fps}
+        return self._info
+
+    def _readAt(self, index: int, size=None, gray=False):
+        # out of range reads None, like a failed decode of Video
+        if not 0 <= index < len(self._frames):
+            return None
+        # a read-only view into the map, no copy unless converted
+        return _convertFrame(np.asarray(self._frames[index]), size, gray)
+
+    def readDict(self, indices: Union[range, Tuple, List] = None, yield_=True, cache=None, prefetch=0,
+                 workers=0, chunk_size=256, stride=1, size=None, gray=False):
+        """ See Video.readDict, prefetch, workers and chunk_size are accepted for compatibility and ignored,
+        frames are served from the map without decoding.
+        """
+        return super().readDict(indices, yield_, cache, stride=stride, size=size, gray=gray)
+
+    def readParallel(self, indices: Union[range, Tuple, List] = None, workers=None, chunk_size=256, ordered=True,
+                     stride=1, size=None, gray=False, max_bytes=1 << 30):
+        """ Serial readDict in index order, workers, chunk_size, ordered and max_bytes are accepted for
+        compatibility and ignored: no frame is decoded and a frame is only a view into the map.
+        """
+        return self.readDict(indices, stride=stride, size=size, gray=gray)
+
+    def close(self):
+        return self
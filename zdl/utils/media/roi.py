@@ -0,0 +1,136 @@
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from zdl.utils.media.rect import Rect
+
+
+def rectsToArray(rects: Union[Sequence[Rect], np.ndarray]) -> np.ndarray:
+    """ Rects or an (N, 4) xyxy array -> (N, 4) float xyxy array. """
+    if isinstance(rects, np.ndarray):
+        return rects.reshape(-1, 4).astype(np.float64)
+    return np.array([r.xyxy for r in rects], dtype=np.float64).reshape(-1, 4)
+
+
+def dilateRects(xyxy: np.ndarray, width, height, dilate_ratio=1, norm=False) -> np.ndarray:
+    """ Vectorized _ImageBase.rectDilate / normRectToAbsRect over (N, 4) xyxy rects, clipped to the image.
+
+    :param norm: rects are normalized to [0, 1], the result is absolute anyway.
+    """
+    xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+    if norm:
+        xyxy = xyxy * [width, height, width, height]
+    d = (xyxy[:, 2:] - xyxy[:, :2]) * (dilate_ratio - 1)
+    dilated = np.concatenate([xyxy[:, :2] - d, xyxy[:, 2:] + d], axis=1)
+    return np.clip(dilated, 0, [width, height, width, height])
+
+
+def mapBack(points: np.ndarray, transforms: np.ndarray) -> np.ndarray:
+    """ Map points found in crops back to image coordinates.
+
+    :param points: (N, K, 2+) per crop, columns after x, y (e.g. confidence) are kept as is.
+    :param transforms: (N, 4) (scale_x, scale_y, offset_x, offset_y) returned by RoiCropper.crop
+    :return: a new array, points at (0, 0), i.e. not detected, stay (0, 0).
+    """
+    points = np.array(points, dtype=np.float64)
+    transforms = np.asarray(transforms, dtype=np.float64)
+    missing = (points[..., 0] == 0) & (points[..., 1] == 0)
+    points[..., :2] = points[..., :2] * transforms[:, None, :2] + transforms[:, None, 2:]
+    points[..., :2][missing] = 0
+    return points
+
+
+class RoiCropper:
+    """ Crops many ROIs of an image resized to one network input size, into a reused batch buffer.
+
+    Example:
+        >> cropper = RoiCropper((368, 368), letterbox=True)
+        >> batch, transforms = cropper.crop(img.org(), [o.bbox for o in objects], dilate_ratio=1.2, norm=True)
+        >> keypoints = mapBack(pose_model(batch), transforms)
+
+    The returned batch is a view into the buffer, it is overwritten by the next crop.
+    """
+
+    def __init__(self, size: Tuple[int, int], letterbox=False, pad_value=0, interpolation=cv2.INTER_LINEAR,
+                 max_batch=32):
+        """
+        :param size: (width, height) of every crop.
+        :param letterbox: keep the aspect ratio and pad, else stretch.
+        :param max_batch: initial buffer capacity, it grows when more ROIs come at once.
+        """
+        self.size = tuple(size)
+        self.letterbox = letterbox
+        self.pad_value = pad_value
+        self.interpolation = interpolation
+        self.max_batch = max_batch
+        self._buffer = None
+
+    def _batchBuffer(self, n, tail: Tuple, dtype) -> np.ndarray:
+        w, h = self.size
+        if self._buffer is None or self._buffer.shape[3:] != tuple(tail) or self._buffer.dtype != dtype \
+                or len(self._buffer) < n:
+            self.max_batch = max(self.max_batch, n)
+            self._buffer = np.empty((self.max_batch, h, w, *tail), dtype=dtype)
+        return self._buffer[:n]
+
+    def crop(self, img: np.ndarray, rects, dilate_ratio=1, norm=False, out: Optional[np.ndarray] = None):
+        """
+        :param img: (H, W[, C]) array
+        :param rects: Rects or an (N, 4) xyxy array
+        :param out: (N, h, w[, C]) buffer to write into instead of the internal one
+        :return: (crops (N, h, w[, C]), transforms (N, 4)), see mapBack
+        """
+        img_h, img_w = img.shape[:2]
+        xyxy = dilateRects(rectsToArray(rects), img_w, img_h, dilate_ratio, norm)
+        x0y0 = np.floor(xyxy[:, :2]).astype(int)
+        x1y1 = np.ceil(xyxy[:, 2:]).astype(int)
+        roi_wh = x1y1 - x0y0
+        w, h = self.size
+        n = len(xyxy)
+        batch = self._batchBuffer(n, img.shape[2:], img.dtype) if out is None else out[:n]
+        # stretch by default, the letterbox scale is shared by both axes
+        new_wh = np.tile([w, h], (n, 1))
+        if self.letterbox:
+            scale = np.min([w, h] / np.maximum(roi_wh, 1), axis=1, keepdims=True)
+            new_wh = np.clip(np.round(roi_wh * scale).astype(int), 1, [w, h])
+        pad = ([w, h] - new_wh) // 2
+        scales = roi_wh / new_wh
+        transforms = np.concatenate([scales, x0y0 - pad * scales], axis=1)
+        for i in range(n):
+            (x0, y0), (x1, y1), (nw, nh), (px, py) = x0y0[i], x1y1[i], new_wh[i], pad[i]
+            if self.letterbox or x1 <= x0 or y1 <= y0:
+                batch[i].fill(self.pad_value)
+            if x1 <= x0 or y1 <= y0:
+                continue
+            cv2.resize(img[y0:y1, x0:x1], (int(nw), int(nh)), dst=batch[i, py:py + nh, px:px + nw],
+                       interpolation=self.interpolation)
+        return batch, transforms
+
+    def batches(self, items: Iterable[Tuple[np.ndarray, Sequence]], batch_size=32, dilate_ratio=1,
+                norm=False) -> Iterator[Tuple[np.ndarray, np.ndarray, List[Tuple[int, int]]]]:
+        """ Pack the ROIs of many frames into full batches for the second stage.
+
+        :param items: (img, rects) per frame
+        :return: yield (crops, transforms, owners), owners are (item number, rect number) of every crop.
+                 crops is overwritten by the next batch.
+        """
+        w, h = self.size
+        buffer, transforms, owners = None, [], []
+        for n, (img, rects) in enumerate(items):
+            rects = rectsToArray(rects)
+            start = 0
+            while start < len(rects):
+                if buffer is None:
+                    buffer = np.empty((batch_size, h, w, *img.shape[2:]), dtype=img.dtype)
+                taken = min(batch_size - len(owners), len(rects) - start)
+                _, t = self.crop(img, rects[start:start + taken], dilate_ratio, norm,
+                                 out=buffer[len(owners):len(owners) + taken])
+                transforms.append(t)
+                owners.extend((n, r) for r in range(start, start + taken))
+                start += taken
+                if len(owners) == batch_size:
+                    yield buffer, np.concatenate(transforms), owners
+                    transforms, owners = [], []
+        if owners:
+            yield buffer[:len(owners)], np.concatenate(transforms), owners
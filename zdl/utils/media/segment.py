@@ -0,0 +1,96 @@
+from typing import Iterable, Tuple
+
+import cv2
+import numpy as np
+
+
+class HistSegmenter:
+    """ Streaming shot boundary detection by histogram distance of consecutive frames.
+
+    Distance is the same as `_ImageBase.distanceHist(gray=False)[-1]`: the euclidean distance of each
+    channel's histogram, averaged over channels and divided by the pixel count. Each frame's histogram
+    is computed once, distances are computed per batch.
+
+    Example:
+        >> segmenter = HistSegmenter(threshold=0.003, scale=0.25)
+        >> sections, distances = segmenter.segment(video.readDict())
+    """
+
+    def __init__(self, threshold=0.003, hist_size=256, scale=1.0, batch_size=64):
+        """
+        :param scale: compute histograms on frames resized by this factor, ratios stay comparable.
+        """
+        assert 256 % hist_size == 0, 'hist_size should be 256 factor!'
+        assert 0 < scale <= 1, 'scale should be in (0, 1]!'
+        self.threshold = threshold
+        self.hist_size = hist_size
+        self.scale = scale
+        self.batch_size = batch_size
+        self.reset()
+
+    def reset(self):
+        self._hists = None  # row 0 keeps the last histogram of the previous batch
+        self._indices = []
+        self._pixels = None
+        self._distances = []
+        self._first = self._last = self._prev = None
+        return self
+
+    def _hist(self, frame: np.ndarray) -> np.ndarray:
+        if self.scale < 1:
+            h, w = frame.shape[:2]
+            frame = cv2.resize(frame, (max(1, int(w * self.scale)), max(1, int(h * self.scale))),
+                               interpolation=cv2.INTER_AREA)
+        channels = 1 if frame.ndim == 2 else frame.shape[2]
+        if self._hists is None:
+            self._hists = np.empty((self.batch_size + 1, channels, self.hist_size), dtype=np.float32)
+            self._pixels = frame.shape[0] * frame.shape[1]
+        return np.stack([cv2.calcHist([frame], [c], None, [self.hist_size], [0, 256]).ravel()
+                         for c in range(channels)])
+
+    def feed(self, index: int, frame: np.ndarray):
+        hist = self._hist(frame)
+        if self._first is None:
+            self._first = self._prev = index
+        else:
+            self._indices.append(index)
+        self._last = index
+        self._hists[len(self._indices)] = hist
+        if len(self._indices) == self.batch_size:
+            self._flush()
+        return self
+
+    def _flush(self):
+        n = len(self._indices)
+        if not n:
+            return
+        hists = self._hists[:n + 1]
+        d = np.sqrt(np.square(hists[1:] - hists[:-1]).sum(axis=-1)).mean(axis=-1) / self._pixels
+        cur = np.asarray(self._indices, dtype=np.float64)
+        pre = np.empty_like(cur)
+        pre[0] = self._prev
+        pre[1:] = cur[:-1]
+        self._distances.append(np.stack([pre, cur, d], axis=1))
+        self._hists[0] = hists[-1]
+        self._prev = self._indices[-1]
+        self._indices = []
+
+    def finish(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: sections - (S, 2) int array of [start, end] indices,
+                 distances - (N, 3) array of [pre index, cur index, distance ratio].
+        """
+        self._flush()
+        distances = np.concatenate(self._distances) if self._distances else np.empty((0, 3))
+        if self._first is None:
+            return np.empty((0, 2), dtype=int), distances
+        cut = distances[:, 2] >= self.threshold
+        starts = np.concatenate([[self._first], distances[cut, 1]]).astype(int)
+        ends = np.concatenate([distances[cut, 0], [self._last]]).astype(int)
+        return np.stack([starts, ends], axis=1), distances
+
+    def segment(self, frames: Iterable[Tuple[int, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+        self.reset()
+        for index, frame in frames:
+            self.feed(index, frame)
+        return self.finish()
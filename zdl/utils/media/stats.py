@@ -0,0 +1,158 @@
+from collections import deque
+from typing import Iterable, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def _grayFrame(frame: np.ndarray) -> np.ndarray:
+    # (H, W), (H, W, 1), BGR or BGRA -> (H, W)
+    if frame.ndim == 2:
+        return frame
+    if frame.shape[2] == 1:
+        return frame[..., 0]
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY if frame.shape[2] == 3 else cv2.COLOR_BGRA2GRAY)
+
+
+class WindowedStats:
+    """ Mean and variance of the last `window` values, O(1) per value by a running sum and sum of squares. """
+
+    def __init__(self, window=30):
+        self.window = window
+        self._values = deque()
+        self._sum = 0.
+        self._sq_sum = 0.
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, value: float) -> 'WindowedStats':
+        value = float(value)
+        self._values.append(value)
+        self._sum += value
+        self._sq_sum += value * value
+        if len(self._values) > self.window:
+            self.remove()
+        return self
+
+    def remove(self) -> Optional[float]:
+        """ Drop the oldest value. """
+        if not self._values:
+            return None
+        value = self._values.popleft()
+        self._sum -= value
+        self._sq_sum -= value * value
+        return value
+
+    def clear(self):
+        self._values.clear()
+        self._sum = self._sq_sum = 0.
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self._sum / len(self._values) if self._values else 0.
+
+    @property
+    def var(self) -> float:
+        # clamped, cancellation may leave a tiny negative
+        return max(self._sq_sum / len(self._values) - self.mean ** 2, 0.) if self._values else 0.
+
+    @property
+    def std(self) -> float:
+        return self.var ** 0.5
+
+
+class RunningHist:
+    """ Sum of the histograms of the last `window` frames, adding or removing one costs O(channels x bins).
+
+    Rows follow _ImageBase.hist: b, g, r of a color frame (alpha is skipped), then gray.
+    """
+
+    def __init__(self, window=30, hist_size=256):
+        assert 256 % hist_size == 0, 'histSize should be 256 factor!'
+        self.window = window
+        self.hist_size = hist_size
+        self._hists = deque()
+        self._sum = None
+
+    def __len__(self):
+        return len(self._hists)
+
+    def frameHist(self, frame: np.ndarray, gray: Optional[np.ndarray] = None) -> np.ndarray:
+        channels = 3 if frame.ndim == 3 and frame.shape[2] >= 3 else 0
+        if gray is None:
+            gray = _grayFrame(frame)
+        hists = [cv2.calcHist([frame], [i], None, [self.hist_size], [0, 256]).ravel() for i in range(channels)]
+        hists.append(cv2.calcHist([gray], [0], None, [self.hist_size], [0, 256]).ravel())
+        return np.array(hists, dtype=np.float64)
+
+    def add(self, hist: np.ndarray) -> 'RunningHist':
+        if self._sum is None or self._sum.shape != hist.shape:
+            assert not self._hists, f'hist shape {hist.shape} differs from the window!'
+            self._sum = np.zeros_like(hist, dtype=np.float64)
+        self._hists.append(hist)
+        self._sum += hist
+        if len(self._hists) > self.window:
+            self.remove()
+        return self
+
+    def remove(self) -> Optional[np.ndarray]:
+        """ Drop the oldest histogram. """
+        if not self._hists:
+            return None
+        hist = self._hists.popleft()
+        self._sum -= hist
+        return hist
+
+    def clear(self):
+        self._hists.clear()
+        self._sum = None
+        return self
+
+    def hist(self, normalize=False) -> np.ndarray:
+        """ The window histogram, rows summing to 1 if `normalize`. """
+        if self._sum is None:
+            return np.zeros((0, self.hist_size))
+        if normalize:
+            return self._sum / np.maximum(self._sum.sum(axis=1, keepdims=True), 1)
+        return self._sum.copy()
+
+
+class StreamStats:
+    """ Rolling brightness and histogram statistics over the last `window` frames of a stream.
+
+    Example:
+        >> stats = StreamStats(window=90)
+        >> for index, frame, stats in stats.stage(video.readDict(prefetch=8)):
+        >>     if stats.brightness.mean < 40:
+        >>         logger.warning(f'frame {index} underexposed')
+    """
+
+    def __init__(self, window=30, hist_size=256):
+        self.window = window
+        self.brightness = WindowedStats(window)
+        self.hists = RunningHist(window, hist_size)
+
+    def update(self, frame: np.ndarray) -> 'StreamStats':
+        frame = np.asarray(frame)
+        gray = _grayFrame(frame)
+        # the same value as ImageCV.brightness
+        self.brightness.add(cv2.mean(gray)[0])
+        self.hists.add(self.hists.frameHist(frame, gray))
+        return self
+
+    def stage(self, frames: Iterable[Tuple[int, np.ndarray]]) -> Iterator[Tuple[int, np.ndarray, 'StreamStats']]:
+        """ Pass (index, frame) pairs, e.g. from Video.readDict, through and update on the way.
+
+        Undecodable (None) frames are passed through without updating.
+        """
+        for index, frame in frames:
+            if frame is not None:
+                self.update(frame)
+            yield index, frame, self
+
+    def clear(self):
+        self.brightness.clear()
+        self.hists.clear()
+        return self
@@ -0,0 +1,133 @@
+import os
+from typing import Callable, Iterator, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+
+def _outArray(out, shape, dtype=np.uint8) -> Optional[np.ndarray]:
+    # a path gets a .npy memory map, so the result never has to fit in memory either
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    if isinstance(out, (str, os.PathLike)):
+        return np.lib.format.open_memmap(out, mode='w+', dtype=dtype, shape=shape)
+    assert out.shape == shape, f'out shape {out.shape} != {shape}!'
+    return out
+
+
+def _writeBand(out: np.ndarray, rows: slice, op: Callable[[Optional[np.ndarray]], np.ndarray]):
+    # OpenCV writes straight into a contiguous band of matching type, otherwise the result is assigned
+    dst = out[rows]
+    result = op(dst if dst.flags.c_contiguous else None)
+    if result is not dst:
+        dst[...] = result
+
+
+class TiledImage:
+    """ A very large image processed band by band, peak memory is bounded by the band size.
+
+    The source can be an array, a np.memmap, or a .npy file which gets memory mapped read-only. Results
+    of per pixel operations go to `out`, an array or a .npy path; reductions (hist, brightness, stats)
+    are merged across bands.
+
+    Example:
+        >> tiled = TiledImage('scan.npy', tile_rows=512)
+        >> tiled.gray(out='scan-gray.npy')
+        >> hists, brightness = tiled.hist(), tiled.brightness()
+    """
+
+    def __init__(self, source: Union[np.ndarray, str, os.PathLike], tile_rows=1024, rgb=False):
+        """
+        :param tile_rows: rows of every band.
+        :param rgb: channels are ordered r, g, b like ImagePIL, else b, g, r like ImageCV.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            source = np.load(source, mmap_mode='r')
+        assert source.ndim == 2 or source.ndim == 3 and source.shape[2] in (1, 3, 4), \
+            f'image shape {source.shape} not supported!'
+        self.source = source
+        self.tile_rows = tile_rows
+        self.rgb = rgb
+        self.CHANNELS_ORDER = ('r', 'g', 'b') if rgb else ('b', 'g', 'r')
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.source.shape
+
+    def isColor(self):
+        return self.source.ndim == 3 and self.source.shape[2] >= 3
+
+    def tiles(self) -> Iterator[Tuple[slice, np.ndarray]]:
+        """ Yield (row slice, band), a band of a memory map is only paged in when read. """
+        for start in range(0, self.shape[0], self.tile_rows):
+            rows = slice(start, min(start + self.tile_rows, self.shape[0]))
+            yield rows, self.source[rows]
+
+    def _grayBand(self, band: np.ndarray, dst=None) -> np.ndarray:
+        if not self.isColor():
+            return band.reshape(band.shape[:2])
+        if band.shape[2] == 4:
+            code = cv2.COLOR_RGBA2GRAY if self.rgb else cv2.COLOR_BGRA2GRAY
+        else:
+            code = cv2.COLOR_RGB2GRAY if self.rgb else cv2.COLOR_BGR2GRAY
+        return cv2.cvtColor(np.ascontiguousarray(band), code, dst=dst)
+
+    def gray(self, out=None) -> np.ndarray:
+        out = _outArray(out, self.shape[:2], self.source.dtype)
+        for rows, band in self.tiles():
+            if self.isColor():
+                _writeBand(out, rows, lambda dst: self._grayBand(band, dst=dst))
+            else:
+                out[rows] = self._grayBand(band)
+        return out
+
+    def HSV(self, out=None) -> np.ndarray:
+        assert self.isColor() and self.shape[2] == 3, 'HSV needs 3 channels image!'
+        out = _outArray(out, self.shape, self.source.dtype)
+        code = cv2.COLOR_RGB2HSV if self.rgb else cv2.COLOR_BGR2HSV
+        for rows, band in self.tiles():
+            _writeBand(out, rows, lambda dst: cv2.cvtColor(np.ascontiguousarray(band), code, dst=dst))
+        return out
+
+    def diff(self, another: Union['TiledImage', np.ndarray, str], out=None) -> np.ndarray:
+        if not isinstance(another, TiledImage):
+            another = TiledImage(another, self.tile_rows, self.rgb)
+        assert self.shape == another.shape, 'The shapes should be the same!'
+        out = _outArray(out, self.shape, self.source.dtype)
+        for rows, band in self.tiles():
+            other = np.ascontiguousarray(another.source[rows])
+            _writeBand(out, rows, lambda dst: cv2.absdiff(np.ascontiguousarray(band), other, dst=dst))
+        return out
+
+    def hist(self, hist_size=256) -> np.ndarray:
+        """ Same layout as _ImageBase.hist: one row per channel in CHANNELS_ORDER if color, then gray. """
+        assert 256 % hist_size == 0, 'histSize should be 256 factor!'
+        channels = 3 if self.isColor() else 0
+        hists = np.zeros((channels + 1, hist_size), dtype=np.float32)
+        for _, band in self.tiles():
+            band = np.ascontiguousarray(band)
+            for i in range(channels):
+                hists[i] += cv2.calcHist([band], [i], None, [hist_size], [0, 256]).ravel()
+            hists[channels] += cv2.calcHist([self._grayBand(band)], [0], None, [hist_size], [0, 256]).ravel()
+        return hists
+
+    def brightness(self) -> float:
+        total = 0.
+        for _, band in self.tiles():
+            total += float(self._grayBand(band).sum(dtype=np.float64))
+        return total / (self.shape[0] * self.shape[1])
+
+    def stats(self) -> dict:
+        """ Per channel mean, std, min and max, accumulated in float64 over bands. """
+        channels = self.shape[2] if self.source.ndim == 3 else 1
+        s, sq = np.zeros(channels), np.zeros(channels)
+        low, high = np.full(channels, np.inf), np.full(channels, -np.inf)
+        for _, band in self.tiles():
+            band = band.reshape(-1, channels)
+            s += band.sum(axis=0, dtype=np.float64)
+            sq += np.einsum('ij,ij->j', band, band, dtype=np.float64)
+            low = np.minimum(low, band.min(axis=0))
+            high = np.maximum(high, band.max(axis=0))
+        n = self.shape[0] * self.shape[1]
+        mean = s / n
+        return {'mean': mean, 'std': np.sqrt(np.maximum(sq / n - mean ** 2, 0)), 'min': low, 'max': high}
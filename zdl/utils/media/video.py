@@ -1,19 +1,29 @@
+import atexit
+import json
 import os
-from functools import reduce
+import queue
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
 from pathlib import Path
-from typing import Iterable, Union, Tuple, List
+from typing import Iterable, Union, Tuple, List, Optional, Dict
 
 import cv2
 import numpy as np
 import pylab
-from scipy.spatial import distance as sci_dist
 # noinspection PyUnresolvedReferences
 from tqdm import tqdm
 
+from zdl.utils.helper.opencv import countFrames, probeVideo
 from zdl.utils.helper.time import timeit
 from zdl.utils.io.log import logger
+from zdl.utils.media.frame_cache import FrameCache, LRUFrameCache
+from zdl.utils.media.frame_ring import SharedFrameRing
 from zdl.utils.media.image import ImageCV
 from zdl.utils.media.media import Media, VIDEO_SUFFIXES, FIGSIZE
+from zdl.utils.media.segment import HistSegmenter
 
 
 def colabMode():
@@ -22,89 +32,428 @@ def colabMode():
     tqdm = note_tqdm
 
 
+class _FramePrefetcher:
+    """ Decode frames of `indices` in order on a daemon thread, into a queue bounded by `depth`. """
+    _END = object()
+
+    def __init__(self, fname, indices, depth, seek_window=80, size=None, gray=False):
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(fname, indices, seek_window, size, gray),
+                                        daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(self, fname, indices, seek_window, size, gray):
+        try:
+            with Video(fname, seek_window, frame_cache=LRUFrameCache(0)) as reader:
+                for i in indices:
+                    if not self._put((i, reader._readAt(i, size, gray))):
+                        return
+        except BaseException as e:
+            self._put(e)
+        self._put(self._END)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = self._queue.get()
+        if item is self._END:
+            raise RuntimeError('prefetch thread finished before all frames were consumed!')
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def _decodeChunk(fname, indices, seek_window, size=None, gray=False):
+    # runs in a worker process, seeks once to the chunk head then decodes forward
+    with Video(fname, seek_window, frame_cache=LRUFrameCache(0)) as reader:
+        return [(i, reader._readAt(i, size, gray)) for i in indices]
+
+
+def _targetSize(w, h, size):
+    target_w, target_h = size
+    if target_w == -1:
+        target_w = max(1, round(w * target_h / h))
+    elif target_h == -1:
+        target_h = max(1, round(h * target_w / w))
+    return target_w, target_h
+
+
+def _convertFrame(frame: np.ndarray, size=None, gray=False):
+    """
+    :param size: (width, height), one of them can be -1 to keep the aspect ratio.
+    """
+    if frame is None:
+        return None
+    if size is not None:
+        h, w = frame.shape[:2]
+        target_w, target_h = _targetSize(w, h, size)
+        if (target_w, target_h) != (w, h):
+            interpolation = cv2.INTER_AREA if target_w < w else cv2.INTER_LINEAR
+            frame = cv2.resize(frame, (target_w, target_h), interpolation=interpolation)
+    if gray and frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return frame
+
+
+class VideoInfoCache:
+    """ On-disk json cache of video metadata, an entry is valid while the file's mtime and size are unchanged.
+
+    The default location is $ZDL_CACHE_DIR/video_info.json, ZDL_CACHE_DIR defaults to ~/.cache/zdl.
+    New entries of Video.getInfo are written in one batch, by dump() or at interpreter exit.
+    """
+    _shared = None
+
+    def __init__(self, path: Optional[str] = None):
+        cache_dir = os.environ.get('ZDL_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'zdl'))
+        self.path = path or os.path.join(cache_dir, 'video_info.json')
+        self._entries = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        atexit.register(self.dump)
+
+    @classmethod
+    def shared(cls) -> 'VideoInfoCache':
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    @staticmethod
+    def _stamp(fname):
+        stat = os.stat(fname)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _loadEntries(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f'video info cache {self.path} unreadable, ignored: {e}')
+            return {}
+
+    def get(self, fname) -> Optional[dict]:
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._loadEntries()
+            entry = self._entries.get(os.path.abspath(fname))
+        if entry is None or tuple(entry['stamp']) != self._stamp(fname):
+            return None
+        return entry['info']
+
+    def put(self, fname, info: dict, dump=True):
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._loadEntries()
+            self._entries[os.path.abspath(fname)] = {'stamp': self._stamp(fname), 'info': info}
+            self._dirty = True
+        if dump:
+            self.dump()
+        return self
+
+    def dump(self):
+        with self._lock:
+            if not self._dirty:
+                return self
+            # merge entries written by other processes meanwhile
+            entries = dict(self._loadEntries(), **self._entries)
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                logger.warning(f'video info cache {self.path} not written: {e}')
+                return self
+            self._entries = entries
+            self._dirty = False
+        return self
+
+
+def probeVideos(fnames: Iterable[str], info_cache: Optional[VideoInfoCache] = None) -> Dict[str, dict]:
+    """ Video infos of many files, the info cache is written once at the end. """
+    info_cache = info_cache or VideoInfoCache.shared()
+    infos = {}
+    try:
+        for fname in fnames:
+            probe = info_cache.get(fname)
+            if probe is None:
+                probe = probeVideo(fname)
+                info_cache.put(fname, probe, dump=False)
+            infos[fname] = probe
+    finally:
+        info_cache.dump()
+    return infos
+
+
 class Video(Media):
-    def __init__(self, fname):
+    # accepted file suffixes, None for any
+    SUFFIXES = VIDEO_SUFFIXES
+
+    def __init__(self, fname, seek_window=80, frame_cache: FrameCache = None,
+                 info_cache: Union[VideoInfoCache, bool, None] = None):
+        """
+        :param seek_window: if the requested index is ahead of the capture cursor by less than this,
+            decode forward instead of seeking.
+        :param frame_cache: cache for decoded frames, default is an LRUFrameCache of 1GB.
+        :param info_cache: on-disk cache for getInfo, default is VideoInfoCache.shared(), False to disable.
+        """
         assert os.path.isfile(fname), f'{fname} not exists!'
-        assert Path(fname).suffix in VIDEO_SUFFIXES, 'file type not supported!'
+        assert self.SUFFIXES is None or Path(fname).suffix in self.SUFFIXES, 'file type not supported!'
         self.fname = fname
+        self.seek_window = seek_window
 
-        self.frame_dict = {}
+        self.frame_cache = LRUFrameCache() if frame_cache is None else frame_cache
+        self.info_cache = info_cache
         self._info = None
+        self._cap = None
+        self._pos = 0  # index of the frame the capture will decode next
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def _capture(self) -> cv2.VideoCapture:
+        if self._cap is None:
+            self._cap = cv2.VideoCapture(self.fname)
+            self._pos = 0
+        return self._cap
+
+    def close(self):
+        if getattr(self, '_cap', None) is not None:
+            self._cap.release()
+            self._cap = None
+        return self
+
+    def _readAt(self, index: int, size=None, gray=False):
+        cap = self._capture()
+        if not self._pos <= index < self._pos + self.seek_window:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            self._pos = index
+        while self._pos < index:
+            # grab() skips the frame without converting it
+            if not cap.grab():
+                return None
+            self._pos += 1
+        success, frame = cap.read()
+        if not success:
+            # cursor position is unknown now, force a seek next time
+            self._pos = -self.seek_window
+            return None
+        self._pos += 1
+        return _convertFrame(frame, size, gray)
 
     def getInfo(self):
         if self._info is None:
-            cap = cv2.VideoCapture(self.fname)
-            success, img = cap.read()
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            frame_count = self._countFrames(cap=cap)
-            # frame_has_read_count = len(self.frame_dict)
-            duration = frame_count / fps if fps else None
-            # width  = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))  # float
-            # height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) # float
+            info_cache = self._infoCache()
+            probe = info_cache.get(self.fname) if info_cache else None
+            if probe is None:
+                probe = probeVideo(cap=self._capture())
+                # the frame count fallback may have moved the capture, force a seek on next read
+                self._pos = -self.seek_window
+                if info_cache:
+                    info_cache.put(self.fname, probe, dump=False)
+            fps, frame_count = probe['fps'], probe['frame_c']
+            shape = (probe['height'], probe['width'], probe['channels'])
             self._info = {'fname': self.fname,
                           'frame_c': frame_count,
-                          'duration': duration,
-                          'shape': img.shape,
-                          'width': img.shape[1],
-                          'height': img.shape[0],
-                          'channels': img.shape[2],
+                          'duration': frame_count / fps if fps else None,
+                          'shape': shape,
+                          'width': shape[1],
+                          'height': shape[0],
+                          'channels': shape[2],
                           'fps': fps}
         return self._info
 
+    def _infoCache(self) -> Optional[VideoInfoCache]:
+        if self.info_cache is None:
+            return VideoInfoCache.shared()
+        return self.info_cache or None
+
     def _countFrames(self, cap=None):
-        cap = cap or cv2.VideoCapture(self.fname)
-        org_pos = cap.get(cv2.CAP_PROP_POS_AVI_RATIO)
-        cap.set(cv2.CAP_PROP_POS_AVI_RATIO, 1)
-        count = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
-        cap.set(cv2.CAP_PROP_POS_AVI_RATIO, org_pos)
+        return countFrames(self.fname, cap=cap)
 
-        return count
+    @property
+    def frame_dict(self):
+        # kept for compatibility, frames are held by the bounded frame_cache now
+        return self.frame_cache
 
     def clear(self):
-        self.frame_dict = {}
+        self.frame_cache.clear()
 
-    def readFrame(self, index: int, need_type: Union[ImageCV, np.ndarray] = ImageCV):
-        cap = cv2.VideoCapture(self.fname)
-        cap.set(cv2.CAP_PROP_POS_FRAMES, index)
-        _, f = cap.read()
+    def readFrame(self, index: int, need_type: Union[ImageCV, np.ndarray] = ImageCV, size=None, gray=False):
+        """
+        :param size: (width, height) to resize to at decode time, one of them can be -1 to keep the aspect ratio.
+        :param gray: convert to a single channel gray frame.
+        """
+        f = self.frame_cache.get(index) if size is None and not gray else None
+        if f is None:
+            f = self._readAt(index, size, gray)
         if need_type == ImageCV:
             return ImageCV(f, title=index)
         else:
             return f
 
-    def readDict(self, indices: Union[range, Tuple, List] = None, yield_=True):
+    def _normIndices(self, indices):
         info = self.getInfo()
         if indices is None:
-            indices = range(info['frame_c'])
-        else:
-            assert isinstance(indices, Iterable), 'indices shoulb be an iterable obj!'
-            assert len(indices) != 0, 'Input indices equals []!'
-            indices = [i + info['frame_c'] if i < 0 else i for i in indices]
-            indices.sort()
-        cap = cv2.VideoCapture(self.fname)
+            return range(info['frame_c'])
+        assert isinstance(indices, Iterable), 'indices shoulb be an iterable obj!'
+        assert len(indices) != 0, 'Input indices equals []!'
+        indices = [i + info['frame_c'] if i < 0 else i for i in indices]
+        indices.sort()
+        if indices[-1] >= info['frame_c']:
+            logger.warning('index out of video range!')
+            indices = [i for i in indices if i < info['frame_c']]
+        return indices
+
+    def readDict(self, indices: Union[range, Tuple, List] = None, yield_=True, cache=None, prefetch=0,
+                 workers=0, chunk_size=256, stride=1, size=None, gray=False):
+        """
+        :param cache: put the decoded frames into frame_cache, default is `not yield_`.
+        :param prefetch: if > 0, decode in a background thread, at most `prefetch` frames ahead of the consumer.
+        :param workers: if > 1, decode in that many processes, see readParallel.
+        :param chunk_size: frames per process task when workers > 1.
+        :param stride: only read every `stride`-th of indices, skipped frames are grabbed without decoding.
+        :param size: (width, height) to resize to at decode time, one of them can be -1 to keep the aspect ratio.
+        :param gray: convert to single channel gray frames at decode time.
+        Resized or gray frames bypass frame_cache, which holds original frames only.
+        """
+        indices = self._normIndices(indices)[::stride]
+        converted = size is not None or gray
+        if cache is None:
+            cache = not yield_
+        cache = cache and not converted
+        source, pending = None, ()
+        if workers > 1 or prefetch:
+            pending = set(indices) if converted else set(i for i in indices if i not in self.frame_cache)
+            pending_indices = [i for i in indices if i in pending]
+            if pending_indices and workers > 1:
+                source = self.readParallel(pending_indices, workers, chunk_size, size=size, gray=gray)
+            elif pending_indices:
+                source = _FramePrefetcher(self.fname, pending_indices, prefetch, self.seek_window, size, gray)
         frame_dict = {}
-        p = -1
-        for i in tqdm(indices, desc='Fetch Frames'):
-            if i >= info['frame_c']:
-                logger.warning('index out of video range!')
-                break
-            if i in self.frame_dict:
-                frame = self.frame_dict[i]
-            else:
-                if i < p + 80:
-                    for _ in range(i - p):
-                        _, frame = cap.read()
+        try:
+            for i in tqdm(indices, desc='Fetch Frames'):
+                if i in pending:
+                    _, frame = next(source)
+                    if cache:
+                        self.frame_cache.put(i, frame)
+                else:
+                    frame = None if converted else self.frame_cache.get(i)
+                    if frame is None:
+                        frame = self._readAt(i, size, gray)
+                        if cache:
+                            self.frame_cache.put(i, frame)
+                if yield_:
+                    yield i, frame
                 else:
-                    cap.set(cv2.CAP_PROP_POS_FRAMES, i)
-                    _, frame = cap.read()
-                p = i
-            if yield_:
-                yield i, frame
-            else:
-                frame_dict[i] = frame
-        self.frame_dict.update(frame_dict)
+                    frame_dict[i] = frame
+        finally:
+            if source is not None:
+                source.close()
         return frame_dict
 
+    def _parallelBudget(self, workers, chunk_size, max_bytes, size=None, gray=False) -> Tuple[int, int]:
+        """ (chunk_size, max_pending) keeping the decoded frames held by readParallel within max_bytes.
+
+        Chunks shrink until every worker can have one in flight, pending chunks are limited to the rest.
+        A budget below one frame per worker is exceeded rather than leaving workers idle.
+        """
+        frame_bytes = int(np.prod(self.frameShape(size, gray)))
+        chunk_size = max(1, min(chunk_size, max_bytes // (frame_bytes * (workers + 1))))
+        # the chunk being yielded is alive besides the pending ones
+        max_pending = max(workers, min(workers * 2, max_bytes // (frame_bytes * chunk_size) - 1))
+        return chunk_size, max_pending
+
+    def readParallel(self, indices: Union[range, Tuple, List] = None, workers=None, chunk_size=256, ordered=True,
+                     stride=1, size=None, gray=False, max_bytes=1 << 30):
+        """ Decode in a process pool, every task decodes `chunk_size` consecutive indices with its own capture.
+
+        cv2 doesn't expose key frame positions, so a chunk seeks once to its head and decodes forward from there.
+        A finished chunk comes back whole, so chunk_size and the number of pending chunks are cut down to keep
+        the decoded frames held here within max_bytes.
+        :param workers: number of processes, default is os.cpu_count().
+        :param ordered: if False, frames are yielded as soon as their chunk is done.
+        :param stride, size, gray: see readDict.
+        :param max_bytes: budget of decoded frames in flight, at least one frame per worker is kept anyway.
+        :return: generator of (index, frame)
+        """
+        indices = self._normIndices(indices)[::stride]
+        workers = workers or os.cpu_count()
+        chunk_size, max_pending = self._parallelBudget(workers, chunk_size, max_bytes, size, gray)
+        chunks = [indices[s:s + chunk_size] for s in range(0, len(indices), chunk_size)]
+        executor = ProcessPoolExecutor(workers)
+        running = deque()
+        try:
+            chunks = iter(chunks)
+            for chunk in islice(chunks, max_pending):
+                running.append(executor.submit(_decodeChunk, self.fname, chunk, self.seek_window, size, gray))
+            while running:
+                if ordered:
+                    done = running.popleft()
+                else:
+                    done = next(as_completed(running))
+                    running.remove(done)
+                for chunk in islice(chunks, 1):
+                    running.append(executor.submit(_decodeChunk, self.fname, chunk, self.seek_window, size, gray))
+                yield from done.result()
+        finally:
+            # not shutdown(cancel_futures=True), which needs python 3.9
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def frameShape(self, size=None, gray=False) -> Tuple[int, ...]:
+        """ Shape of the frames read with the same size and gray arguments. """
+        info = self.getInfo()
+        w, h = (info['width'], info['height']) if size is None else _targetSize(info['width'], info['height'], size)
+        return (h, w) if gray or info['channels'] == 1 else (h, w, info['channels'])
+
+    def sharedRing(self, slots=8, size=None, gray=False) -> SharedFrameRing:
+        """ A SharedFrameRing whose slots fit the frames read with the same size and gray arguments. """
+        return SharedFrameRing(self.frameShape(size, gray), slots)
+
+    def feedRing(self, ring: SharedFrameRing, indices: Union[range, Tuple, List] = None, consumers=1, **read_params):
+        """ Produce frames into the ring, blocks while all slots are in use, end marks are put at last.
+        :param read_params: passed to readDict, e.g. prefetch, stride, size, gray.
+        """
+        try:
+            for i, frame in self.readDict(indices, **read_params):
+                if frame is None:
+                    logger.warning(f'frame {i} decode failed, skipped!')
+                    continue
+                ring.put(i, frame)
+        finally:
+            ring.end(consumers)
+        return self
+
+    def exportRaw(self, path, indices: Union[range, Tuple, List] = None, **read_params) -> 'RawVideo':
+        """ Decode once into a raw frame file, see raw_video.exportRaw. """
+        from zdl.utils.media.raw_video import exportRaw
+        return exportRaw(self, path, indices, **read_params)
+
     def show(self, indices=None):
         # for i,f in self.read_dict(indices).items():
         for i, f in self.readDict(indices):
@@ -116,28 +465,123 @@ class Video(Media):
         return self
 
     @timeit
-    def section(self, threshold=0.003, range_=None, show=False, log=False, plot=False):
-        distances = []
-        sections = [[0, None]]
-
-        def compare(pre, cur):
-            pre_obj = ImageCV(pre[1], pre[0])
-            cur_obj = ImageCV(cur[1], cur[0])
-            distance = pre_obj.distanceHist(cur_obj, method=sci_dist.euclidean, gray=False, show=False)[-1]
-            distances.append([pre[0], cur[0], distance])
-            if distance >= threshold:
-                sections[-1][-1] = pre[0]
-                sections.append([cur[0], None])
-                if log:
-                    print(f'[{pre[0]}]<->[{cur[0]}] distance: {distance}, threshold: {threshold}')
-                if show:
-                    pre_obj.show()
-                    cur_obj.show()
-            del pre_obj, cur_obj
-            return cur
-
-        reduce(compare, tqdm(self.readDict(range_), 'Calculating distances'))
-        sections[-1][-1] = self.getInfo()['frame_c'] - 1 if range_ is None else range_[-1]
+    def section(self, threshold=0.003, range_=None, show=False, log=False, plot=False, workers=0, scale=1.0):
+        """
+        :param scale: compute histograms on frames resized by this factor, for throughput.
+        :return: sections - (S, 2) array of [start, end], distances - (N, 3) array of [pre, cur, distance]
+        """
+        segmenter = HistSegmenter(threshold, scale=scale)
+        sections, distances = segmenter.segment(
+            tqdm(self.readDict(range_, workers=workers), 'Calculating distances'))
+        for pre, cur, distance in distances[distances[:, 2] >= threshold]:
+            if log:
+                print(f'[{int(pre)}]<->[{int(cur)}] distance: {distance}, threshold: {threshold}')
+            if show:
+                self.readFrame(int(pre)).show()
+                self.readFrame(int(cur)).show()
         if plot:
-            pylab.plot(range(len(distances)), np.array(distances).transpose()[-1])
+            pylab.plot(range(len(distances)), distances[:, -1])
         return sections, distances
+
+
+class VideoWriter:
+    """ Video file sink, frames are encoded on a background thread through a bounded queue.
+
+    Example:
+        >> with VideoWriter('out.mp4', source=video) as writer:
+        >>     for i, frame in video.readDict():
+        >>         writer.write(ImageCV(frame).drawBboxes(bboxes))
+    """
+    _END = object()
+
+    def __init__(self, fname, fps=None, size=None, fourcc='mp4v', source: Video = None, queue_size=32,
+                 async_=True, is_color=True):
+        """
+        :param fps, size: (width, height), default to those of `source`.
+        :param fourcc: codec 4 chars, e.g. 'mp4v', 'MJPG', 'avc1'.
+        :param async_: if False, encode inline in write().
+        :param is_color: gray frames are converted to BGR when True, and the reverse when False.
+        """
+        if source is not None:
+            info = source.getInfo()
+            fps = fps or info['fps']
+            size = size or (info['width'], info['height'])
+        assert fps and size, 'fps and size should be given, directly or by source!'
+        self.fname = fname
+        self.fps = fps
+        self.size = tuple(size)
+        self.is_color = is_color
+        self._writer = cv2.VideoWriter(fname, cv2.VideoWriter_fourcc(*fourcc), fps, self.size, is_color)
+        assert self._writer.isOpened(), f'{fname} can not be opened for writing with {fourcc}!'
+        self.frame_c = 0
+        self._error = None
+        self._queue = None
+        self._thread = None
+        if async_:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is self._END:
+                return
+            if self._error is None:
+                try:
+                    self._writer.write(frame)
+                except BaseException as e:
+                    self._error = e
+
+    def _raiseError(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _conform(self, frame: np.ndarray) -> np.ndarray:
+        if (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if self.is_color and frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        elif not self.is_color and frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return frame
+
+    def write(self, frame: Union[ImageCV, np.ndarray], copy=True):
+        """
+        :param frame: an ImageCV or a BGR/gray ndarray, resized to self.size if needed.
+        :param copy: encoding is deferred, so the queued frame is detached from the caller's buffer.
+            Set False in hot loops that never modify a written frame afterwards.
+        """
+        self._raiseError()
+        assert self._writer is not None, 'writer already closed!'
+        if isinstance(frame, ImageCV):
+            frame = frame.org()
+        frame = np.asarray(frame)
+        conformed = self._conform(frame)
+        # ImageCV/ImgArray frames come as views, so compare buffers rather than objects
+        if copy and self._queue is not None and np.may_share_memory(conformed, frame):
+            conformed = conformed.copy()
+        if self._queue is None:
+            self._writer.write(conformed)
+        else:
+            self._queue.put(conformed)
+        self.frame_c += 1
+        return self
+
+    def close(self):
+        if self._writer is None:
+            return self
+        if self._thread is not None:
+            self._queue.put(self._END)
+            self._thread.join()
+        self._writer.release()
+        self._writer = None
+        self._raiseError()
+        return self